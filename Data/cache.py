@@ -0,0 +1,98 @@
+import hashlib
+import os
+import re
+
+from Data import metrics
+from Data.normalize import SOURCE_FILES, TIDY_VERSION, combine_tidy, load_tidy
+from Data.statbank import PARSER_VERSION
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - the cache is skipped without pyarrow
+    feather = None
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_slot(path, dimension=None):
+    # One slot per source file and dimension label: files sharing a name in
+    # other directories, or parsed under another label, are cached apart
+    label = "" if dimension is None else dimension
+    return hashlib.sha256(f"{os.path.abspath(path)}\x1f{label}".encode("utf-8")).hexdigest()[:12]
+
+
+def cache_key(path, digest=None, dimension=None):
+    # Slot, content hash and code versions: a change to any of them forces a re-parse
+    digest = file_digest(path) if digest is None else digest
+    return f"{cache_slot(path, dimension)}-{digest[:16]}-p{PARSER_VERSION}-t{TIDY_VERSION}"
+
+
+def cache_path(path, cache_dir=CACHE_DIR, digest=None, dimension=None):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}-{cache_key(path, digest, dimension)}.feather")
+
+
+def _remove_stale(path, keep, cache_dir, dimension=None):
+    # Earlier versions of the same slot (or from before slots, with none), so
+    # other exports, even ones whose names start with this stem, are kept
+    stem = os.path.splitext(os.path.basename(path))[0]
+    slot = cache_slot(path, dimension)
+    pattern = re.compile(rf"^{re.escape(stem)}-(?:{slot}-)?[0-9a-f]{{16}}-p\d+-t\d+\.feather$")
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if pattern.match(name) and entry != keep:
+            os.remove(entry)
+
+
+@metrics.timed("ingest.cache_write")
+def write_frame(df, target):
+    # Uncompressed Arrow IPC: reads skip decompression, and metadata such as
+    # the row count comes straight from the memory-mapped file
+    tmp = f"{target}.{os.getpid()}.tmp"
+    feather.write_feather(df, tmp, compression="uncompressed")
+    os.replace(tmp, target)
+
+
+@metrics.timed("ingest.cache_read")
+def read_frame(target):
+    # A fast columnar read; to_pandas still copies every column into pandas
+    return feather.read_table(target, memory_map=True).to_pandas()
+
+
+def ensure_cached(path, dimension=None, cache_dir=CACHE_DIR):
+    # Returns the cache file for `path` and whether it had to be (re)built
+    target = cache_path(path, cache_dir, dimension=dimension)
+    if os.path.exists(target):
+        return target, False
+
+    return store_cached(path, load_tidy(path, dimension), cache_dir, dimension=dimension), True
+
+
+def store_cached(path, tidy, cache_dir=CACHE_DIR, digest=None, dimension=None):
+    # Cache a table that was already parsed from `path` (e.g. while downloading
+    # it) under the dimension label it was parsed with
+    target = cache_path(path, cache_dir, digest, dimension)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_frame(tidy, target)
+    _remove_stale(path, target, cache_dir, dimension)
+    return target
+
+
+def cached_tidy(path, dimension=None, cache_dir=CACHE_DIR):
+    if feather is None:
+        return load_tidy(path, dimension)
+    return read_frame(ensure_cached(path, dimension, cache_dir)[0])
+
+
+def load_cached_dataset(files=None, cache_dir=CACHE_DIR):
+    files = SOURCE_FILES if files is None else files
+    return combine_tidy([cached_tidy(path, dimension, cache_dir) for dimension, path in files.items()])
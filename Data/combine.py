@@ -0,0 +1,37 @@
+import pandas as pd
+
+from Data import metrics
+
+# Every source table shares these keys; its categories become columns
+KEYS = ["Resident", "Duration", "Year"]
+CELL_KEYS = KEYS + ["Dimension", "Category"]
+
+
+def dedupe(tidy):
+    # Hash the key columns once instead of comparing whole rows; later rows win
+    hashed = pd.util.hash_pandas_object(tidy[CELL_KEYS], index=False)
+    return tidy[~hashed.duplicated(keep="last").to_numpy()]
+
+
+def to_wide(tidy):
+    # One column per "Dimension: Category", indexed by the shared keys
+    tidy = dedupe(tidy)
+    columns = tidy["Dimension"].astype(str) + ": " + tidy["Category"].astype(str)
+    order = pd.unique(columns)
+    wide = (tidy.assign(Column=pd.Categorical(columns, categories=order))
+            .set_index(KEYS + ["Column"])["Value"]
+            .unstack("Column"))
+    wide.columns = list(wide.columns.astype(str))
+    return wide.astype("Int32")
+
+
+@metrics.timed("ingest.combine_sources")
+def combine_sources(tables):
+    # Outer-join the tables one at a time on the shared keys, so only the
+    # result and the current table are in memory at once
+    combined = None
+    for tidy in tables:
+        wide = to_wide(tidy)
+        combined = wide if combined is None else combined.join(wide, how="outer")
+    combined = combined.sort_index()
+    return combined.reset_index()
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from Data import metrics
+
+# Category rows that already hold the total of their dimension
+TOTAL_CATEGORIES = {"All Denmark", "Total"}
+SERIES_KEYS = ["Dimension", "Category", "Resident", "Duration"]
+
+
+def _nonzero(denominator):
+    # Positional float denominator with empty totals mapped to NaN
+    denominator = pd.Series(denominator.to_numpy(dtype="float64", na_value=np.nan))
+    return denominator.where(denominator != 0)
+
+
+def add_measures(tidy):
+    # Shares and year-over-year changes for every cell, computed in a few
+    # vectorized passes over the whole table
+    cube = tidy.sort_values(SERIES_KEYS + ["Year"]).reset_index(drop=True)
+    value = cube["Value"].astype("float64")
+
+    # Measures are float32: plenty for shares and growth rates, half the memory
+    counts = cube["Value"].astype("Int32")
+    previous = counts.groupby([cube[k] for k in SERIES_KEYS], observed=True).shift()
+    cube["YoY"] = counts - previous
+    cube["YoYPct"] = (value / previous.astype("float64").where(previous != 0) - 1).astype("float32")
+
+    # Share of the dimension total: the total row where the export has one,
+    # otherwise the sum of the categories
+    slice_keys = ["Dimension", "Resident", "Duration", "Year"]
+    is_total = cube["Category"].isin(TOTAL_CATEGORIES)
+    sums = cube[~is_total].groupby(slice_keys, observed=True)["Value"].sum()
+    totals = cube[is_total].groupby(slice_keys, observed=True)["Value"].sum()
+    denominator = totals.combine_first(sums)
+    index = pd.MultiIndex.from_frame(cube[slice_keys])
+    cube["Share"] = (value / _nonzero(denominator.reindex(index))).astype("float32")
+
+    # Share of the "Total" duration row of the same series and year
+    duration_keys = ["Dimension", "Category", "Resident", "Year"]
+    duration_total = cube[cube["Duration"] == "Total"].set_index(duration_keys)["Value"]
+    index = pd.MultiIndex.from_frame(cube[duration_keys])
+    cube["DurationShare"] = (value / _nonzero(duration_total.reindex(index))).astype("float32")
+    return cube
+
+
+def _labels(frame, keys, rows):
+    # Python-level key tuples for the given row positions
+    return zip(*(frame[k].to_numpy()[rows].tolist() for k in keys))
+
+
+class Slices:
+    # One sorted copy of the columns plus a dict from key to row range, so a
+    # lookup is a single hash probe followed by a positional slice
+
+    def __init__(self, frame, keys, inner, columns):
+        ordered = frame.sort_values(keys + [inner], kind="stable").reset_index(drop=True)
+        codes = np.column_stack([
+            ordered[k].cat.codes.to_numpy() if isinstance(ordered[k].dtype, pd.CategoricalDtype)
+            else ordered[k].to_numpy()
+            for k in keys
+        ])
+        starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]).any(axis=1)])
+        stops = np.r_[starts[1:], len(ordered)]
+
+        self.table = ordered[columns]
+        self.ranges = dict(zip(_labels(ordered, keys, starts), zip(starts.tolist(), stops.tolist())))
+
+    def get(self, key):
+        bounds = self.ranges.get(key)
+        if bounds is None:
+            return None
+        return self.table.iloc[bounds[0]:bounds[1]].reset_index(drop=True)
+
+
+class Cube:
+    # Every rollup the dashboard needs, materialized once at load time
+
+    @metrics.timed("aggregate.cube")
+    def __init__(self, tidy):
+        self.frame = add_measures(tidy)
+        frame = self.frame
+
+        self.values = dict(zip(_labels(frame, SERIES_KEYS + ["Year"], slice(None)),
+                               frame["Value"].fillna(0).to_numpy(dtype="int64").tolist()))
+        self.years = sorted(int(y) for y in frame["Year"].unique())
+
+        # Series over time, categories within a slice, durations within a series
+        self.by_year = Slices(frame, SERIES_KEYS, "Year", ["Year", "Value", "YoY", "YoYPct", "Share"])
+        self.by_category = Slices(frame, ["Dimension", "Resident", "Duration", "Year"], "Category",
+                                  ["Category", "Value", "Share", "YoY"])
+        self.by_duration = Slices(frame, ["Dimension", "Category", "Resident", "Year"], "Duration",
+                                  ["Duration", "Value", "DurationShare", "YoY"])
+
+    def value(self, dimension, category, resident, duration="Total", year=None):
+        year = self.years[-1] if year is None else year
+        return int(self.values.get((dimension, category, resident, duration, year), 0))
+
+    def series(self, dimension, category, resident, duration="Total"):
+        return self.by_year.get((dimension, category, resident, duration))
+
+    def categories(self, dimension, resident, year, duration="Total"):
+        return self.by_category.get((dimension, resident, duration, year))
+
+    def durations(self, dimension, category, resident, year):
+        return self.by_duration.get((dimension, category, resident, year))
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import email.utils
+import hashlib
+import io
+import json
+import os
+import queue
+import random
+import sys
+import time
+from urllib.parse import urljoin
+
+from Data.cache import CACHE_DIR, feather, file_digest, store_cached
+from Data.normalize import normalize
+from Data.sources import DATA_DIR, SOURCE_FILES
+from Data.statbank import read_statbank
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - fetching needs aiohttp, the rest of Data does not
+    aiohttp = None
+
+# Tables to fetch: dimension -> URL, absolute or relative to the base URL
+TABLES = {dimension: os.path.basename(path) for dimension, path in SOURCE_FILES.items()}
+BASE_URL = os.environ.get("STATBANK_URL")
+
+# Validators (ETag, Last-Modified) and digests from the previous fetch
+STATE_FILE = os.path.join(CACHE_DIR, "fetch-state.json")
+
+MAX_PARALLEL = 4
+RETRIES = 3
+BACKOFF = 0.5
+TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ChunkStream(io.RawIOBase):
+    # Blocking file view of chunks pushed from the event loop, so the parser
+    # can run in a thread while the body is still downloading
+
+    def __init__(self):
+        self.chunks = queue.Queue()
+        self.pending = b""
+        self.done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            if self.done:
+                return 0
+            chunk = self.chunks.get()
+            if chunk is None:
+                self.done = True
+                return 0
+            if isinstance(chunk, BaseException):
+                raise chunk
+            self.pending = chunk
+        n = min(len(buffer), len(self.pending))
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    def feed(self, chunk):
+        self.chunks.put(chunk)
+
+    def finish(self):
+        self.chunks.put(None)
+
+    def fail(self, error):
+        self.chunks.put(error)
+
+
+class RetryableStatus(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.retry_after = retry_after
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def conditional_headers(previous, target):
+    # Only revalidate when the local copy is the one the validators describe
+    if not previous or not os.path.exists(target) or file_digest(target) != previous.get("digest"):
+        return {}
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+    return headers
+
+
+def retry_delay(attempt, retry_after=None):
+    # Exponential backoff with jitter, or the server's Retry-After if it gave one
+    if retry_after is not None:
+        return retry_after
+    return BACKOFF * 2 ** attempt * (0.5 + random.random())
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    when = email.utils.parsedate_to_datetime(value)
+    return max(0.0, when.timestamp() - time.time())
+
+
+async def download(session, url, headers, target, dimension):
+    # One GET: None on 304, otherwise (tidy table, validators) with the body
+    # parsed while it streams in and written next to the other exports
+    async with session.get(url, headers=headers) as response:
+        if response.status == 304:
+            return None
+        if response.status in RETRY_STATUSES:
+            raise RetryableStatus(response.status, parse_retry_after(response.headers.get("Retry-After")))
+        response.raise_for_status()
+
+        loop = asyncio.get_running_loop()
+        stream = ChunkStream()
+        parsing = loop.run_in_executor(None, lambda: normalize(read_statbank(io.BufferedReader(stream)), dimension))
+        digest = hashlib.sha256()
+        part = f"{target}.{os.getpid()}.part"
+        try:
+            with open(part, "wb") as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    stream.feed(chunk)
+            stream.finish()
+            tidy = await parsing
+        except BaseException as e:
+            stream.fail(e)
+            await asyncio.gather(parsing, return_exceptions=True)
+            if os.path.exists(part):
+                os.remove(part)
+            raise
+        os.replace(part, target)
+
+        return tidy, {"etag": response.headers.get("ETag"),
+                      "last_modified": response.headers.get("Last-Modified"),
+                      "digest": digest.hexdigest()}
+
+
+async def fetch_table(session, limit, name, url, target, state, cache_dir):
+    start = time.perf_counter()
+    result = {"name": name, "url": url, "path": target, "status": None, "attempts": 0,
+              "rows": 0, "bytes": 0, "seconds": 0.0, "error": None}
+    previous = state.get(name)
+    headers = conditional_headers(previous, target)
+
+    async with limit:
+        for attempt in range(RETRIES + 1):
+            result["attempts"] = attempt + 1
+            try:
+                downloaded = await download(session, url, headers, target, name)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatus) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUSES
+                if attempt == RETRIES or not retryable:
+                    result.update(status="failed", error=f"{type(e).__name__}: {e}",
+                                  seconds=time.perf_counter() - start)
+                    return result, None
+                await asyncio.sleep(retry_delay(attempt, getattr(e, "retry_after", None)))
+            except Exception as e:
+                # Parse errors are not transient; keep the previous local copy
+                result.update(status="failed", error=f"{type(e).__name__}: {e}",
+                              seconds=time.perf_counter() - start)
+                return result, None
+
+    if downloaded is None:
+        result.update(status="unchanged", seconds=time.perf_counter() - start)
+        return result, None
+
+    tidy, validators = downloaded
+    state[name] = {"url": url, **validators}
+    if feather is not None:
+        store_cached(target, tidy, cache_dir, dimension=name)
+    result.update(status="updated", rows=len(tidy), bytes=os.path.getsize(target),
+                  seconds=time.perf_counter() - start)
+    return result, tidy
+
+
+async def fetch_all(tables, base_url=None, data_dir=DATA_DIR, parallel=MAX_PARALLEL,
+                    cache_dir=CACHE_DIR, state_file=STATE_FILE):
+    # Fetch every table over one pooled session; returns one result per table
+    # and the tidy tables that were downloaded (unchanged ones are not re-read)
+    if aiohttp is None:
+        raise RuntimeError("aiohttp is required to fetch StatBank tables")
+    state = load_state(state_file)
+    limit = asyncio.Semaphore(parallel)
+    connector = aiohttp.TCPConnector(limit=parallel)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        jobs = []
+        for name, url in tables.items():
+            url = urljoin(base_url, url) if base_url else url
+            target = os.path.join(data_dir, os.path.basename(url.split("?")[0]) or f"{name}.csv")
+            jobs.append(fetch_table(session, limit, name, url, target, state, cache_dir))
+        outcomes = await asyncio.gather(*jobs)
+    save_state(state, state_file)
+
+    results = [result for result, _ in outcomes]
+    tables = {result["name"]: tidy for result, tidy in outcomes if tidy is not None}
+    return results, tables
+
+
+def fetch(tables=None, base_url=BASE_URL, **kwargs):
+    return asyncio.run(fetch_all(TABLES if tables is None else tables, base_url, **kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download StatBank tables concurrently, skipping unchanged ones")
+    parser.add_argument("--base-url", default=BASE_URL, help="prefix for relative table URLs; defaults to STATBANK_URL")
+    parser.add_argument("--config", default=None, help="JSON file mapping dimension to table URL")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where the downloaded exports are written")
+    parser.add_argument("--parallel", type=int, default=MAX_PARALLEL)
+    parser.add_argument("--json", action="store_true", help="print the per-table report as JSON")
+    args = parser.parse_args()
+
+    tables = TABLES
+    if args.config:
+        with open(args.config, "r") as f:
+            tables = json.load(f)
+    if not args.base_url and any("://" not in url for url in tables.values()):
+        parser.error("relative table URLs need --base-url or STATBANK_URL")
+
+    results, _ = fetch(tables, args.base_url, data_dir=args.data_dir, parallel=args.parallel)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            detail = r["error"] if r["error"] else f"{r['rows']} rows, {r['bytes'] / 1e3:,.1f} KB"
+            if r["status"] == "unchanged":
+                detail = "not modified"
+            print(f"{r['seconds'] * 1e3:>9.1f} ms  {r['name']}: {r['status']} after {r['attempts']} "
+                  f"attempt(s), {detail}")
+    return 1 if any(r["status"] == "failed" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
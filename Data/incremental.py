@@ -0,0 +1,188 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from Data.cache import CACHE_DIR, cache_path, file_digest, read_frame, store_cached, write_frame
+from Data.ingest import find_exports
+from Data.normalize import SOURCE_FILES, TIDY_VERSION, combine_tidy, dimension_from_title, normalize
+from Data.statbank import PARSER_VERSION, read_statbank
+
+# One Feather partition per source file and year, plus a manifest of hashes
+STORE_DIR = os.path.join(CACHE_DIR, "incremental")
+MANIFEST = "manifest.json"
+N_STUBS = 3
+
+
+def column_digest(values):
+    return hashlib.sha256("\x1f".join(values).encode("utf-8")).hexdigest()[:16]
+
+
+def load_manifest(store_dir=STORE_DIR):
+    path = os.path.join(store_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"version": [PARSER_VERSION, TIDY_VERSION], "sources": {}}
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    # A parser or schema change invalidates every partition
+    if manifest.get("version") != [PARSER_VERSION, TIDY_VERSION]:
+        return {"version": [PARSER_VERSION, TIDY_VERSION], "sources": {}}
+    return manifest
+
+
+def save_manifest(manifest, store_dir=STORE_DIR):
+    path = os.path.join(store_dir, MANIFEST)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def source_key(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def partition_path(store_dir, key, year):
+    return os.path.join(store_dir, key, f"{year}.feather")
+
+
+def assemble(key, source, store_dir=STORE_DIR):
+    # The file's tidy table rebuilt from its year partitions, in the row order
+    # normalize() gives it (leaf by leaf, years within each leaf)
+    parts = [read_frame(partition_path(store_dir, key, year)) for year in source["columns"]]
+    tidy = combine_tidy(parts)
+    order = np.arange(len(tidy)).reshape(len(parts), len(parts[0])).T.ravel()
+    return tidy.iloc[order].reset_index(drop=True)
+
+
+def merge(previous, tidy, years, changed):
+    # Unchanged years from the previous table plus the re-normalized ones,
+    # back in normalize() row order (leaf by leaf, years within each leaf)
+    kept = previous[previous["Year"].isin([int(y) for y in years if y not in changed])]
+    merged = combine_tidy([kept, tidy])
+    n_kept, n_changed = len(years) - len(changed), len(changed)
+    n_leaves = len(tidy) // n_changed
+    leaf = np.r_[np.repeat(np.arange(n_leaves), n_kept), np.repeat(np.arange(n_leaves), n_changed)]
+    position = {int(year): i for i, year in enumerate(years)}
+    column = merged["Year"].map(position).to_numpy()
+    return merged.iloc[np.lexsort((column, leaf))].reset_index(drop=True)
+
+
+def refresh_file(path, manifest, store_dir=STORE_DIR, cache_dir=CACHE_DIR, dimension=None):
+    # Normalize only the year columns that are new or whose cells changed and
+    # merge them into the per-file cache that Data.store loads from, under the
+    # same dimension label (None: taken from the title). Finding the changed
+    # columns still means reading the whole export.
+    start = time.perf_counter()
+    key = source_key(path)
+    previous = manifest["sources"].get(key, {})
+    digest = file_digest(path)
+    same_label = previous.get("label") == dimension
+    result = {"path": path, "status": "unchanged", "years": [], "removed": [], "seconds": 0.0}
+    if previous.get("digest") == digest and same_label:
+        if not os.path.exists(cache_path(path, cache_dir, digest, dimension)):
+            store_cached(path, assemble(key, previous, store_dir), cache_dir, digest, dimension)
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    wide = read_statbank(path)
+    label = dimension or dimension_from_title(wide.attrs.get("title", ""))
+    stubs = list(wide.columns[:N_STUBS])
+    years = list(wide.columns[N_STUBS:])
+
+    # A changed hierarchy or label means every year has to be rebuilt
+    structure = column_digest(wide[stubs].to_numpy().ravel().tolist())
+    rebuild = previous.get("structure") != structure or not same_label
+    old_columns = {} if rebuild else previous.get("columns", {})
+    columns = {year: column_digest(wide[year].tolist()) for year in years}
+    changed = [year for year in years if old_columns.get(year) != columns[year]]
+    removed = [year for year in previous.get("columns", {}) if year not in columns]
+
+    for year in changed + removed:
+        target = partition_path(store_dir, key, year)
+        if os.path.exists(target):
+            os.remove(target)
+    tidy = None
+    if changed:
+        tidy = normalize(wide[stubs + changed], dimension=label)
+        os.makedirs(os.path.join(store_dir, key), exist_ok=True)
+        for year, part in tidy.groupby("Year", observed=True):
+            write_frame(part.reset_index(drop=True), partition_path(store_dir, key, year))
+
+    manifest["sources"][key] = {"path": path, "digest": digest, "dimension": label, "label": dimension,
+                                "structure": structure, "columns": columns}
+
+    # The cached table of the previous version of the file supplies the
+    # unchanged years; without it they are read back from the partitions
+    previous_cache = cache_path(path, cache_dir, previous["digest"], dimension) if previous else None
+    if tidy is not None and len(changed) == len(years):
+        merged = tidy
+    elif tidy is not None and previous_cache and os.path.exists(previous_cache):
+        merged = merge(read_frame(previous_cache), tidy, years, changed)
+    else:
+        merged = assemble(key, manifest["sources"][key], store_dir)
+    store_cached(path, merged, cache_dir, digest, dimension)
+    result.update(status="new" if not previous else "updated", years=changed, removed=removed,
+                  seconds=time.perf_counter() - start)
+    return result
+
+
+def refresh(paths=None, store_dir=STORE_DIR, cache_dir=CACHE_DIR):
+    paths = list(SOURCE_FILES.values()) if paths is None else paths
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = load_manifest(store_dir)
+    if not manifest["sources"]:
+        # Fresh or invalidated manifest: drop partitions it no longer describes
+        for entry in os.listdir(store_dir):
+            if os.path.isdir(os.path.join(store_dir, entry)):
+                shutil.rmtree(os.path.join(store_dir, entry))
+
+    # The bundled exports are cached under the labels Data.store asks for
+    labels = {os.path.abspath(p): dimension for dimension, p in SOURCE_FILES.items()}
+    results = []
+    for path in paths:
+        try:
+            results.append(refresh_file(path, manifest, store_dir, cache_dir, labels.get(os.path.abspath(path))))
+        except Exception as e:
+            results.append({"path": path, "status": "failed", "error": f"{type(e).__name__}: {e}"})
+    save_manifest(manifest, store_dir)
+    return results
+
+
+def load_incremental_dataset(store_dir=STORE_DIR):
+    manifest = load_manifest(store_dir)
+    frames = []
+    for key, source in manifest["sources"].items():
+        for year in source["columns"]:
+            target = partition_path(store_dir, key, year)
+            if os.path.exists(target):
+                frames.append(read_frame(target))
+    return combine_tidy(frames) if frames else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge only new or changed year columns into the stored dataset")
+    parser.add_argument("sources", nargs="*", help="directories or glob patterns; defaults to the bundled exports")
+    parser.add_argument("--store-dir", default=STORE_DIR)
+    args = parser.parse_args()
+
+    paths = find_exports(args.sources) if args.sources else None
+    results = refresh(paths, args.store_dir)
+    for r in results:
+        name = os.path.basename(r["path"])
+        if r["status"] == "failed":
+            print(f"{name}: failed, {r['error']}")
+            continue
+        detail = f" years {', '.join(r['years'])}" if r["years"] else ""
+        detail += f", removed {', '.join(r['removed'])}" if r["removed"] else ""
+        print(f"{r['seconds'] * 1e3:>9.1f} ms  {name}: {r['status']}{detail}")
+    return 1 if any(r["status"] == "failed" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Data.cache import CACHE_DIR, ensure_cached, feather, read_frame
+from Data.normalize import combine_tidy
+from Data.statbank import is_export
+
+
+def find_files(patterns):
+    # Directories expand to their *.csv files; anything else is a glob
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths += sorted(glob.glob(os.path.join(pattern, "*.csv")))
+        else:
+            paths += sorted(glob.glob(pattern))
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+
+def find_exports(patterns):
+    # Matching files that are StatBank exports; other CSVs are passed over
+    return [path for path in find_files(patterns) if is_export(path)]
+
+
+def ingest_file(path, cache_dir=CACHE_DIR):
+    # Runs in a worker. The parsed table goes to the Arrow cache and only
+    # this small dict travels back to the parent.
+    start = time.perf_counter()
+    result = {"path": path, "cache": None, "built": False, "rows": 0, "seconds": 0.0, "error": None}
+    try:
+        if feather is None:
+            raise RuntimeError("pyarrow is required for parallel ingestion")
+        result["cache"], result["built"] = ensure_cached(path, cache_dir=cache_dir)
+        result["rows"] = feather.read_table(result["cache"], memory_map=True).num_rows
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def ingest(paths, workers=None, cache_dir=CACHE_DIR):
+    # Parse exports in parallel; returns the combined tidy table and one result per file
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        results = [ingest_file(path, cache_dir) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            results = list(pool.map(ingest_file, paths, [cache_dir] * len(paths)))
+
+    frames = [read_frame(r["cache"]) for r in results if r["error"] is None]
+    tidy = combine_tidy(frames) if frames else None
+    return tidy, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse StatBank exports in parallel into the tidy cache")
+    parser.add_argument("sources", nargs="+", help="directories or glob patterns of CSV exports")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the number of CPUs")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--json", action="store_true", help="print the per-file report as JSON")
+    args = parser.parse_args()
+
+    candidates = find_files(args.sources)
+    paths = [path for path in candidates if is_export(path)]
+    skipped = [os.path.basename(path) for path in candidates if path not in paths]
+    start = time.perf_counter()
+    tidy, results = ingest(paths, args.workers, args.cache_dir)
+    summary = {
+        "files": len(results),
+        "skipped": skipped,
+        "failed": sum(r["error"] is not None for r in results),
+        "rows": 0 if tidy is None else len(tidy),
+        "seconds": time.perf_counter() - start,
+    }
+
+    if args.json:
+        json.dump({"summary": summary, "files": results}, sys.stdout, indent=2)
+        print()
+    else:
+        for r in results:
+            status = r["error"] or ("parsed" if r["built"] else "cached")
+            print(f"{r['seconds'] * 1e3:>9.1f} ms {r['rows']:>9} rows  {os.path.basename(r['path'])}: {status}")
+        if skipped:
+            print(f"Skipped {', '.join(skipped)}: not StatBank exports")
+        print(f"{summary['files']} files, {summary['failed']} failed, "
+              f"{summary['rows']} rows in {summary['seconds']:.2f} s")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import atexit
+import functools
+import hmac
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# DASHBOARD_METRICS=1 records wall time and payload sizes per stage;
+# DASHBOARD_METRICS=memory also traces peak Python memory, which slows
+# allocation-heavy code noticeably. Unset, every hook is a flag check.
+MODES = {"1": False, "on": False, "memory": True}
+
+ENABLED = False
+TRACE_MEMORY = False
+
+_stats = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(memory=False):
+    global ENABLED, TRACE_MEMORY
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if not ENABLED:
+        atexit.register(log_summary)
+    ENABLED, TRACE_MEMORY = True, memory
+
+
+def disable():
+    global ENABLED, TRACE_MEMORY
+    ENABLED, TRACE_MEMORY = False, False
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def record(name, seconds=None, peak=None, size=None):
+    with _lock:
+        entry = _stats.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                         "peak_bytes": None, "bytes": 0, "last_bytes": None})
+        if seconds is not None:
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        if peak is not None:
+            entry["peak_bytes"] = max(entry["peak_bytes"] or 0, peak)
+        if size is not None:
+            entry["bytes"] += size
+            entry["last_bytes"] = size
+
+
+class Stage:
+    # Handle yielded by stage(); callers may set .bytes for the payload size
+    __slots__ = ("bytes", "start_memory", "peak_memory")
+
+    def __init__(self):
+        self.bytes = None
+        self.start_memory = self.peak_memory = 0
+
+
+@contextmanager
+def stage(name):
+    if not ENABLED:
+        yield Stage()
+        return
+
+    current = Stage()
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    if TRACE_MEMORY:
+        # Fold the peak so far into the enclosing stages, then measure ours alone
+        now, peak = tracemalloc.get_traced_memory()
+        for outer in stack:
+            outer.peak_memory = max(outer.peak_memory, peak)
+        tracemalloc.reset_peak()
+        current.start_memory = current.peak_memory = now
+    stack.append(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        peak = None
+        if TRACE_MEMORY:
+            current.peak_memory = max(current.peak_memory, tracemalloc.get_traced_memory()[1])
+            for outer in stack:
+                outer.peak_memory = max(outer.peak_memory, current.peak_memory)
+            peak = current.peak_memory - current.start_memory
+        record(name, seconds, peak, current.bytes)
+
+
+def timed(name, size=None):
+    # Decorator form of stage(); `size` maps the result to its payload bytes
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with stage(name):
+                result = func(*args, **kwargs)
+            if size is not None:
+                # Serialization is its own stage so it does not inflate `name`
+                with stage(f"{name} [serialize]") as current:
+                    current.bytes = size(result)
+                record(name, size=current.bytes)
+            return result
+        return wrapper
+    return decorate
+
+
+def json_size(figure):
+    # Serialized size of a figure or figure dict, as Dash would send it
+    from plotly.io.json import to_json_plotly
+    return len(to_json_plotly(figure).encode("utf-8"))
+
+
+def snapshot():
+    with _lock:
+        stats = {name: dict(entry) for name, entry in _stats.items()}
+    for entry in stats.values():
+        entry["mean_seconds"] = entry["seconds"] / entry["count"] if entry["count"] else None
+    return {"enabled": ENABLED, "memory": TRACE_MEMORY, "stages": stats}
+
+
+def summary():
+    stages = snapshot()["stages"]
+    width = max([len(name) for name in stages] + [5])
+    lines = [f"{'stage':<{width}} {'calls':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'peak KB':>9} {'last KB':>9}"]
+    for name, s in sorted(stages.items(), key=lambda item: -item[1]["seconds"]):
+        mean = f"{s['mean_seconds'] * 1e3:9.2f}" if s["count"] else f"{'-':>9}"
+        peak = f"{s['peak_bytes'] / 1e3:9.1f}" if s["peak_bytes"] is not None else f"{'-':>9}"
+        last = f"{s['last_bytes'] / 1e3:9.1f}" if s["last_bytes"] is not None else f"{'-':>9}"
+        lines.append(f"{name:<{width}} {s['count']:>6} {s['seconds'] * 1e3:>10.2f} {mean} "
+                     f"{s['max_seconds'] * 1e3:>9.2f} {peak} {last}")
+    return "\n".join(lines)
+
+
+def log_summary():
+    if ENABLED and _stats:
+        print(f"Metrics summary (pid {os.getpid()})\n{summary()}")
+
+
+def install(server, path="/_metrics", token=None):
+    # Per-request timing and response bytes, plus a JSON endpoint. Register
+    # before other after_request hooks so sizes are measured last, after
+    # compression. Behind a proxy every client looks local, so the endpoint
+    # exists only while metrics are on and a token (DASHBOARD_METRICS_TOKEN)
+    # is set, and answers only requests that send it as a bearer token.
+    import flask
+
+    token = os.environ.get("DASHBOARD_METRICS_TOKEN") if token is None else token
+
+    @server.before_request
+    def start_timer():
+        if ENABLED:
+            flask.g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_request(response):
+        start = flask.g.pop("metrics_start", None) if ENABLED else None
+        if start is not None:
+            name = f"http {flask.request.method} {flask.request.path}"
+            if flask.request.path.endswith("_dash-update-component"):
+                output = (flask.request.get_json(silent=True) or {}).get("output", "")
+                name = f"http callback {output.strip('.')}"
+            size = None if response.direct_passthrough else response.calculate_content_length()
+            record(name, time.perf_counter() - start, size=size)
+        return response
+
+    if not (ENABLED and token):
+        return
+
+    @server.route(path)
+    def metrics_endpoint():
+        sent = flask.request.headers.get("Authorization", "")
+        if not hmac.compare_digest(sent.encode(), f"Bearer {token}".encode()):
+            flask.abort(403)
+        return flask.Response(json.dumps(snapshot(), indent=2), mimetype="application/json")
+
+
+if os.environ.get("DASHBOARD_METRICS") in MODES:
+    enable(memory=MODES[os.environ["DASHBOARD_METRICS"]])
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from Data import metrics
+from Data.sources import SOURCE_FILES
+from Data.statbank import read_statbank, to_counts
+
+# Bump whenever the tidy schema changes so cached tables get rebuilt
+TIDY_VERSION = 2
+
+RESIDENT_STATUSES = ["Stays", "Stays with children", "Women", "Children"]
+
+# Long-format schema shared by every source table
+TIDY_COLUMNS = ["Dimension", "Category", "Resident", "Duration", "Year", "Value"]
+DIMENSION_COLUMNS = ["Dimension", "Category", "Resident", "Duration"]
+
+
+def dimension_from_title(title):
+    # "... by age, resident status, duration and time" -> "Age"
+    variables = title.split(" by ", 1)[-1].split(",")
+    for variable in variables:
+        variable = variable.strip()
+        if variable and variable != "resident status":
+            return variable.split()[0].capitalize()
+    return "Total"
+
+
+def categorical(values):
+    # Keep categories in the order the export lists them
+    values = pd.Series(values)
+    return pd.Categorical(values, categories=pd.unique(values.dropna()))
+
+
+@metrics.timed("ingest.normalize")
+def normalize(wide, dimension=None):
+    if dimension is None:
+        dimension = dimension_from_title(wide.attrs.get("title", ""))
+
+    section, group, item = wide["Section"], wide["Group"], wide["Item"]
+    year_columns = list(wide.columns[3:])
+
+    # Forward-fill the indented hierarchy; a section row resets its group
+    section_label = section.where(section.ne("")).ffill()
+    group_label = group.where(group.ne("") | section.ne("")).ffill().replace("", np.nan)
+
+    leaf = item.ne("").to_numpy()
+    outer = section_label[leaf].to_numpy()
+    inner = group_label[leaf].to_numpy()
+
+    # Age/Ancestry nest resident status inside the category, Region the other way round
+    if pd.Series(outer).isin(RESIDENT_STATUSES).all():
+        resident, category = outer, inner
+    else:
+        resident, category = inner, outer
+
+    # Melt the year columns in one reshape instead of row by row
+    values, dtype = to_counts(wide.loc[leaf, year_columns])
+    n_leaves, n_years = values.shape
+    tidy = pd.DataFrame({
+        "Dimension": np.repeat(dimension, n_leaves * n_years),
+        "Category": np.repeat(category, n_years),
+        "Resident": np.repeat(resident, n_years),
+        "Duration": np.repeat(item[leaf].to_numpy(), n_years),
+        "Year": np.tile(np.asarray(year_columns, dtype=np.int16), n_leaves),
+        "Value": pd.array(values.ravel(), dtype=dtype),
+    })
+    for col in DIMENSION_COLUMNS:
+        tidy[col] = categorical(tidy[col].to_numpy())
+    return tidy.reset_index(drop=True)
+
+
+def load_tidy(file_path, dimension=None):
+    return normalize(read_statbank(file_path), dimension=dimension)
+
+
+@metrics.timed("ingest.combine_tidy")
+def combine_tidy(frames):
+    # Align every frame on shared categories first so concat stays categorical
+    frames = list(frames)
+    for col in DIMENSION_COLUMNS:
+        categories = union_categoricals([f[col] for f in frames]).categories
+        frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_dataset(files=None):
+    files = SOURCE_FILES if files is None else files
+    return combine_tidy([load_tidy(path, dimension) for dimension, path in files.items()])
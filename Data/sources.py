@@ -0,0 +1,9 @@
+import os
+
+# Kept free of pandas so light callers (the startup snapshot) can import it
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_FILES = {
+    "Age": os.path.join(DATA_DIR, "Age.csv"),
+    "Ancestry": os.path.join(DATA_DIR, "Ancestry.csv"),
+    "Region": os.path.join(DATA_DIR, "Region.csv"),
+}
@@ -0,0 +1,156 @@
+import csv
+import io
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+from Data import metrics
+
+# Bump whenever the parsed output changes shape so cached results get rebuilt
+PARSER_VERSION = 1
+
+# StatBank exports are latin-1, ';'-delimited and always quote text cells
+ENCODING = "latin1"
+DELIMITER = ";"
+DEFAULT_CHUNKSIZE = 100_000
+
+# Nullable integer dtypes tried, narrowest first, when storing counts
+COUNT_DTYPES = ["Int8", "Int16", "Int32", "Int64"]
+
+# Names for the leading label ("stub") columns of an export
+STUB_COLUMNS = ("Section", "Group", "Item")
+
+
+def stub_names(count):
+    names = list(STUB_COLUMNS[:count])
+    names += [f"Level {i}" for i in range(len(names), count)]
+    return names
+
+
+def count_dtype(values):
+    # Narrowest nullable integer dtype that holds every value
+    top = np.nanmax(np.abs(values)) if np.size(values) and not np.all(np.isnan(values)) else 0
+    for dtype in COUNT_DTYPES:
+        if top <= np.iinfo(dtype.lower()).max:
+            return dtype
+    return COUNT_DTYPES[-1]
+
+
+def to_counts(frame):
+    # StatBank suppresses cells with ".." or "-"; those become <NA>
+    values = frame.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    return values, count_dtype(values)
+
+
+def _open_text(source):
+    # Accept a path, a binary stream (e.g. an HTTP response) or a text stream
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "r", encoding=ENCODING, newline=""), True
+    if isinstance(source, io.TextIOBase):
+        return source, False
+    return io.TextIOWrapper(source, encoding=ENCODING, newline=""), False
+
+
+def read_header(handle):
+    # The title can span several lines and ends at the first blank line;
+    # the line after that holds the column labels (blank stubs + years)
+    title = []
+    for line in handle:
+        line = line.strip()
+        if not line:
+            break
+        title.append(line.strip('"'))
+    header_line = handle.readline()
+    if not header_line.strip():
+        raise ValueError("Export has no header row after the title")
+
+    header = [cell.strip() for cell in next(csv.reader([header_line], delimiter=DELIMITER))]
+    n_stubs = 0
+    while n_stubs < len(header) and not header[n_stubs]:
+        n_stubs += 1
+
+    columns = stub_names(n_stubs) + header[n_stubs:]
+    return " ".join(title), columns
+
+
+def is_export(path, max_lines=20):
+    # An export opens with a quoted title, a blank line and a header row whose
+    # leading label cells are blank; other CSVs (e.g. our own combined output)
+    # are told apart from the first few lines without parsing the body
+    with open(path, "r", encoding=ENCODING, newline="") as f:
+        lines = [line.strip() for line in itertools.islice(f, max_lines)]
+    if not lines or not lines[0].startswith('"') or "" not in lines[:-1]:
+        return False
+    header = [cell.strip() for cell in next(csv.reader([lines[lines.index("") + 1]], delimiter=DELIMITER))]
+    return len(header) > 1 and header[0] == "" and header[-1] != ""
+
+
+def iter_chunks(source, chunksize=DEFAULT_CHUNKSIZE):
+    handle, owned = _open_text(source)
+    try:
+        title, columns = read_header(handle)
+        reader = pd.read_csv(
+            handle,
+            sep=DELIMITER,
+            header=None,
+            names=columns,
+            dtype=str,
+            na_filter=False,
+            skip_blank_lines=False,
+            chunksize=chunksize,
+            engine="c",
+        )
+        with reader:
+            for chunk in reader:
+                # Strip padding column by column instead of cell by cell
+                for col in chunk.columns:
+                    chunk[col] = chunk[col].str.strip()
+                chunk.attrs["title"] = title
+
+                # The body ends at the first blank line; footnotes follow it
+                blank = ~chunk.ne("").any(axis=1).to_numpy()
+                if blank.any():
+                    end = int(blank.argmax())
+                    if end:
+                        yield chunk.iloc[:end]
+                    return
+                yield chunk
+    finally:
+        if owned:
+            handle.close()
+
+
+@metrics.timed("ingest.parse")
+def read_statbank(source, chunksize=DEFAULT_CHUNKSIZE):
+    chunks = list(iter_chunks(source, chunksize=chunksize))
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)
+    df.attrs["title"] = chunks[0].attrs["title"]
+    return df
+
+
+@metrics.timed("ingest.clean_data")
+def clean_data(file_path):
+    # Drop-in replacement for the original per-row cleaner in 01_data.py
+    try:
+        if not os.path.exists(file_path):
+            print(f"File not found: {file_path}")
+            return None
+
+        print(f"Processing file: {file_path}")
+        df_cleaned = read_statbank(file_path)
+        df_cleaned = df_cleaned.drop_duplicates().reset_index(drop=True)
+
+        # Labels as categoricals, year columns as narrow nullable integers
+        stubs = [col for col in df_cleaned.columns if not col.isdigit()]
+        years = [col for col in df_cleaned.columns if col.isdigit()]
+        values, dtype = to_counts(df_cleaned[years])
+        typed = {col: df_cleaned[col].astype("category") for col in stubs}
+        typed.update({col: pd.array(values[:, i], dtype=dtype) for i, col in enumerate(years)})
+        return pd.DataFrame(typed)
+    except Exception as e:
+        print(f"Error processing file {file_path}: {e}")
+        return None
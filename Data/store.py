@@ -0,0 +1,137 @@
+import pandas as pd
+
+from Data.cache import load_cached_dataset
+from Data.cube import SERIES_KEYS, Cube
+from Data.trends import load_trends
+
+# National totals are read from the "All Denmark" rows of the region table
+NATIONAL = ("Region", "All Denmark")
+REGIONS = ["Region Hovedstaden", "Region Sjælland", "Region Syddanmark",
+           "Region Midtjylland", "Region Nordjylland"]
+DURATIONS = ["1 day", "2-5 days", "6-30 days", "31-119 days", "120-364 days", "All year"]
+
+_dataset = None
+_cube = None
+_trends = None
+
+
+def get_dataset():
+    # Loaded once per process and shared by every figure
+    global _dataset
+    if _dataset is None:
+        _dataset = load_cached_dataset()
+    return _dataset
+
+
+def get_cube():
+    # Every rollup is materialized once, so views below are dict lookups
+    global _cube
+    if _cube is None:
+        _cube = Cube(get_dataset())
+    return _cube
+
+
+def get_trends():
+    # Growth rates and projections of every series, cached on disk per dataset
+    global _trends
+    if _trends is None:
+        _trends = load_trends(get_cube().frame)
+    return _trends
+
+
+def set_dataset(df):
+    global _dataset, _cube, _trends
+    _dataset, _cube, _trends = df, None, None
+
+
+def latest_year(cube=None):
+    cube = get_cube() if cube is None else cube
+    return cube.years[-1]
+
+
+def years(cube=None):
+    cube = get_cube() if cube is None else cube
+    return list(cube.years)
+
+
+def categories(dimension, df=None):
+    df = get_dataset() if df is None else df
+    return df.loc[df["Dimension"] == dimension, "Category"].unique().tolist()
+
+
+def _stack(parts, label, columns):
+    frames = [part.assign(**{label: name}) for name, part in parts if part is not None]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+def resident_trend(residents=("Stays", "Women", "Children"), breakdown=NATIONAL, cube=None):
+    cube = get_cube() if cube is None else cube
+    parts = [(r, cube.series(breakdown[0], breakdown[1], r)) for r in residents]
+    return _stack(parts, "Resident", ["Resident", "Year", "Value"])
+
+
+def age_distribution(year=None, resident="Women", cube=None):
+    cube = get_cube() if cube is None else cube
+    year = cube.years[-1] if year is None else year
+    rows = cube.categories("Age", resident, year)
+    if rows is None:
+        return pd.DataFrame(columns=["Category", "Value", "Share"])
+    return rows[["Category", "Value", "Share"]]
+
+
+def duration_distribution(year=None, residents=("Women", "Children"), breakdown=NATIONAL, cube=None):
+    cube = get_cube() if cube is None else cube
+    year = cube.years[-1] if year is None else year
+    parts = [(r, cube.durations(breakdown[0], breakdown[1], r, year)) for r in residents]
+    rows = _stack(parts, "Resident", ["Duration", "Resident", "Value"])
+    return rows[rows["Duration"].isin(DURATIONS)].reset_index(drop=True)
+
+
+def region_trend(resident="Stays", cube=None):
+    cube = get_cube() if cube is None else cube
+    parts = [(region, cube.series("Region", region, resident)) for region in REGIONS]
+    return _stack(parts, "Region", ["Year", "Region", "Value"])
+
+
+def kpi(resident, year=None, cube=None):
+    cube = get_cube() if cube is None else cube
+    return cube.value(NATIONAL[0], NATIONAL[1], resident, year=year)
+
+
+def kpi_trend(resident, year=None, trends=None):
+    trends = get_trends() if trends is None else trends
+    return trends.summary(NATIONAL[0], NATIONAL[1], resident, year=year)
+
+
+def resident_forecast(residents=("Stays", "Women", "Children"), breakdown=NATIONAL, trends=None):
+    trends = get_trends() if trends is None else trends
+    parts = [(r, trends.forecast(breakdown[0], breakdown[1], r)) for r in residents]
+    return _stack(parts, "Resident", ["Resident", "Year", "Value", "Lower", "Upper"])
+
+
+def forecasts(duration="Total", trends=None):
+    # Projections of every series as plain lists, nested by dimension,
+    # category and resident, for drawing forecast bands in the browser
+    trends = get_trends() if trends is None else trends
+    nested = {}
+    for dimension, category, resident, series_duration in trends.rows:
+        if series_duration != duration:
+            continue
+        forecast = trends.forecast(dimension, category, resident, duration)
+        if forecast is not None:
+            nested.setdefault(dimension, {}).setdefault(category, {})[resident] = forecast.to_dict("list")
+    return nested
+
+
+def columnar(cube=None):
+    # The cube's counts as dictionary-encoded columns, in the cube's row order
+    # (series, then year), compact enough to ship to the browser once
+    cube = get_cube() if cube is None else cube
+    frame = cube.frame
+    columns = {key: {"categories": frame[key].cat.categories.astype(str).tolist(),
+                     "codes": frame[key].cat.codes.tolist()}
+               for key in SERIES_KEYS}
+    values = frame["Value"].astype(object).where(frame["Value"].notna(), None).tolist()
+    return {"keys": columns, "Year": frame["Year"].tolist(), "Value": values}
@@ -0,0 +1,253 @@
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from Data import metrics
+from Data.cube import SERIES_KEYS
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# Bump whenever the measures below change
+TRENDS_VERSION = 1
+
+# Years in the trailing rolling mean, and years projected past the last one
+WINDOW = 3
+HORIZON = 3
+
+# Half-width of the forecast band in standard errors of a prediction (about 95%)
+Z = 1.96
+
+
+def series_matrix(frame):
+    # The cube's rows (sorted by series, then year) scattered into a
+    # series x year matrix; years a series has no row for are NaN
+    codes = np.column_stack([frame[k].cat.codes.to_numpy() for k in SERIES_KEYS])
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]).any(axis=1)])
+    rows = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(frame)]))
+
+    year = frame["Year"].to_numpy()
+    years = np.unique(year)
+    values = np.full((len(starts), len(years)), np.nan)
+    values[rows, np.searchsorted(years, year)] = frame["Value"].to_numpy(dtype="float64", na_value=np.nan)
+
+    keys = frame[SERIES_KEYS].iloc[starts].astype(str).reset_index(drop=True)
+    return keys, years, values
+
+
+def first_valid(mask):
+    # Column of the first True per row (0 for rows without any)
+    return mask.argmax(axis=1)
+
+
+def year_over_year(values):
+    previous = np.c_[np.full(len(values), np.nan), values[:, :-1]]
+    delta = values - previous
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(previous != 0, delta / previous, np.nan)
+    return delta, pct
+
+
+def rolling_mean(values, window=WINDOW):
+    # Trailing mean over complete windows only, from running sums
+    filled = np.nan_to_num(values)
+    sums = np.cumsum(np.c_[np.zeros(len(values)), filled], axis=1)
+    counts = np.cumsum(np.c_[np.zeros(len(values)), ~np.isnan(values)], axis=1)
+    means = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        complete = counts[:, window:] - counts[:, :-window] == window
+        means[:, window - 1:] = np.where(complete, (sums[:, window:] - sums[:, :-window]) / window, np.nan)
+    return means
+
+
+def growth_rate(values, years):
+    # Compound annual growth from each series' first observed year to every
+    # later year; the last column is the CAGR over the whole series
+    observed = ~np.isnan(values)
+    start = first_valid(observed)
+    base = values[np.arange(len(values)), start][:, None]
+    span = (years[None, :] - years[start][:, None]).astype("float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.power(values / base, 1 / span) - 1
+    return np.where(observed & (span > 0) & (base > 0) & (values >= 0), rate, np.nan)
+
+
+def fit(x, y, mask):
+    # Least-squares line through the masked cells of every row at once.
+    # Returns the intercept and slope per row plus what a prediction
+    # interval needs: residual standard error, count, mean x and Sxx
+    weight = mask.astype("float64")
+    y = np.where(mask, y, 0.0)
+    n = weight.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_x = (weight * x).sum(axis=1) / n
+        mean_y = y.sum(axis=1) / n
+        dx = weight * (x - mean_x[:, None])
+        sxx = (dx ** 2).sum(axis=1)
+        slope = (dx * (y - mean_y[:, None])).sum(axis=1) / sxx
+        intercept = mean_y - slope * mean_x
+        residuals = weight * (y - intercept[:, None] - slope[:, None] * x)
+        error = np.sqrt((residuals ** 2).sum(axis=1) / (n - 2))
+    # Three points are the fewest that leave an estimate of the spread
+    enough = n >= 3
+    return (np.where(enough, intercept, np.nan), np.where(enough, slope, np.nan),
+            np.where(enough, error, np.nan), n, mean_x, sxx)
+
+
+def project(x, y, mask, ahead):
+    # Fitted values at the `ahead` x positions with a prediction band
+    intercept, slope, error, n, mean_x, sxx = fit(x, y, mask)
+    mid = intercept[:, None] + slope[:, None] * ahead
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = Z * error[:, None] * np.sqrt(1 + 1 / n[:, None] + (ahead - mean_x[:, None]) ** 2 / sxx[:, None])
+    return slope, mid, mid - spread, mid + spread
+
+
+class Trends:
+    # Every measure for every series of the cube, as series x year (or
+    # series x projected year) arrays, with a dict from series key to row
+    ARRAYS = ("years", "values", "yoy", "yoy_pct", "rolling", "cagr", "forecast_years",
+              "linear_slope", "linear", "linear_lower", "linear_upper",
+              "exponential_rate", "exponential", "exponential_lower", "exponential_upper")
+
+    def __init__(self, keys, arrays):
+        self.keys = keys
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.rows = {key: i for i, key in enumerate(zip(*(keys[k].tolist() for k in SERIES_KEYS)))}
+        self.columns = {int(year): i for i, year in enumerate(self.years.tolist())}
+
+    @classmethod
+    @metrics.timed("aggregate.trends")
+    def from_frame(cls, frame, window=WINDOW, horizon=HORIZON):
+        keys, years, values = series_matrix(frame)
+        yoy, yoy_pct = year_over_year(values)
+
+        # Fits run on years since the first one; the exponential model is a
+        # line through the logs of the positive counts
+        x = (years - years[0]).astype("float64")[None, :]
+        forecast_years = np.arange(years[-1] + 1, years[-1] + 1 + horizon)
+        ahead = (forecast_years - years[0]).astype("float64")[None, :]
+        observed = ~np.isnan(values)
+        slope, linear, lower, upper = project(x, values, observed, ahead)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            logs = np.log(values)
+        log_slope, log_mid, log_lower, log_upper = project(x, logs, observed & (values > 0), ahead)
+
+        arrays = {
+            "years": years, "values": values, "yoy": yoy, "yoy_pct": yoy_pct,
+            "rolling": rolling_mean(values, window), "cagr": growth_rate(values, years),
+            "forecast_years": forecast_years,
+            # Counts cannot go below zero, however steep the fitted decline
+            "linear_slope": slope, "linear": linear,
+            "linear_lower": np.maximum(lower, 0), "linear_upper": upper,
+            "exponential_rate": np.exp(log_slope) - 1, "exponential": np.exp(log_mid),
+            "exponential_lower": np.exp(log_lower), "exponential_upper": np.exp(log_upper),
+        }
+        return cls(keys, arrays)
+
+    def to_npz(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, **{f"key_{k}": self.keys[k].to_numpy(dtype=str) for k in SERIES_KEYS},
+                 **{name: getattr(self, name) for name in self.ARRAYS})
+        os.replace(tmp, path)
+
+    @classmethod
+    def from_npz(cls, path):
+        with np.load(path) as data:
+            keys = pd.DataFrame({k: data[f"key_{k}"] for k in SERIES_KEYS})
+            return cls(keys, {name: data[name] for name in cls.ARRAYS})
+
+    def row(self, dimension, category, resident, duration="Total"):
+        return self.rows.get((dimension, category, resident, duration))
+
+    def summary(self, dimension, category, resident, duration="Total", year=None):
+        # The measures of one series in one year (the last by default)
+        row = self.row(dimension, category, resident, duration)
+        column = len(self.years) - 1 if year is None else self.columns.get(year)
+        if row is None or column is None:
+            return None
+        cell = {name: getattr(self, name)[row, column] for name in ("values", "yoy", "yoy_pct", "rolling", "cagr")}
+        start = first_valid(~np.isnan(self.values[row][None, :]))[0]
+        previous = int(self.years[column - 1]) if column > 0 else None
+        return {"year": int(self.years[column]), "previous": previous, "since": int(self.years[start]),
+                "value": cell["values"], "yoy": cell["yoy"], "yoy_pct": cell["yoy_pct"],
+                "rolling": cell["rolling"], "cagr": cell["cagr"]}
+
+    def forecast(self, dimension, category, resident, duration="Total", model="linear"):
+        # Projected years with the band around them, starting from the last
+        # observed count so a chart can draw the band on from the series
+        row = self.row(dimension, category, resident, duration)
+        if row is None or np.isnan(getattr(self, model)[row]).all():
+            return None
+        last = np.flatnonzero(~np.isnan(self.values[row]))[-1]
+        observed = self.values[row, last]
+        return pd.DataFrame({
+            "Year": np.r_[self.years[last], self.forecast_years],
+            "Value": np.r_[observed, getattr(self, model)[row]],
+            "Lower": np.r_[observed, getattr(self, f"{model}_lower")[row]],
+            "Upper": np.r_[observed, getattr(self, f"{model}_upper")[row]],
+        })
+
+
+def data_key(frame, window=WINDOW, horizon=HORIZON):
+    # Hash of the cube's keys and counts plus the settings, so any change to
+    # the data (not just to the exports on disk) computes the trends afresh
+    digest = hashlib.sha256(f"trends-{TRENDS_VERSION}-{window}-{horizon}-{Z}".encode())
+    for key in SERIES_KEYS:
+        digest.update("\x1f".join(frame[key].cat.categories.astype(str)).encode())
+        digest.update(frame[key].cat.codes.to_numpy().tobytes())
+    digest.update(frame["Year"].to_numpy(dtype="int64").tobytes())
+    digest.update(frame["Value"].to_numpy(dtype="float64", na_value=np.nan).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def trends_path(key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"trends-{key}.npz")
+
+
+def load_trends(frame, cache_dir=CACHE_DIR):
+    # Computed once per dataset and kept next to the parsed exports
+    path = trends_path(data_key(frame), cache_dir)
+    if os.path.exists(path):
+        return Trends.from_npz(path)
+    trends = Trends.from_frame(frame)
+    os.makedirs(cache_dir, exist_ok=True)
+    trends.to_npz(path)
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if name.startswith("trends-") and name.endswith(".npz") and entry != path:
+            os.remove(entry)
+    return trends
+
+
+def main():
+    from Data import store
+
+    frame = store.get_cube().frame
+    start = time.perf_counter()
+    trends = Trends.from_frame(frame)
+    computed = time.perf_counter() - start
+    load_trends(frame)
+    path = trends_path(data_key(frame))
+    start = time.perf_counter()
+    Trends.from_npz(path)
+    loaded = time.perf_counter() - start
+
+    print(f"{len(trends.keys)} series x {len(trends.years)} years computed in {computed * 1e3:.1f} ms, "
+          f"loaded from {path} in {loaded * 1e3:.1f} ms")
+    for resident in ("Women", "Children"):
+        summary = trends.summary("Region", "All Denmark", resident)
+        forecast = trends.forecast("Region", "All Denmark", resident)
+        print(f"  {resident}: {summary['value']:,.0f} in {summary['year']}, {summary['yoy_pct']:+.1%} on the year before, "
+              f"{summary['cagr']:+.1%} a year since {summary['since']}; "
+              f"{int(forecast['Year'].iloc[-1])} projected at {forecast['Value'].iloc[-1]:,.0f} "
+              f"({forecast['Lower'].iloc[-1]:,.0f}-{forecast['Upper'].iloc[-1]:,.0f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,10 @@
 import plotly.express as px
-import json
 import pandas as pd
 
-# Load the filtered GeoJSON (https://cartographyvectors.com/map/1434-denmark-with-regions)
-with open("filtered_denmark_regions.geojson", "r") as file:
-    filtered_geojson = json.load(file)
+from simplify import load_geometry
+
+# Simplified region geometry (https://cartographyvectors.com/map/1434-denmark-with-regions)
+filtered_geojson = load_geometry()
 
 # Danish to English region name mapping
 region_mapping = {
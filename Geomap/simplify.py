@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from Data.cache import file_digest
+
+GEOMAP_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_FILE = os.path.join(GEOMAP_DIR, "regioner_geo2.json")
+CACHE_DIR = os.path.join(GEOMAP_DIR, ".cache")
+
+# Bump whenever the simplified output changes so cached levels get rebuilt
+SIMPLIFY_VERSION = 1
+
+# Grid size used to quantize coordinates before building the topology
+QUANTIZATION = 100_000
+
+# Douglas-Peucker tolerances in degrees, finest first. At the dashboard's
+# zoom 5 one screen pixel is roughly 0.04 degrees of longitude.
+LEVELS = [0.0005, 0.002, 0.005, 0.01, 0.02]
+
+# Coarsest level is picked whose area differs from the source by at most this
+MAX_AREA_ERROR = 0.01
+
+_loaded = {}
+
+
+def _polygons(geometry):
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    return geometry["coordinates"]
+
+
+def ring_area(ring):
+    x, y = ring[:, 0].astype(float), ring[:, 1].astype(float)
+    return 0.5 * abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+
+def feature_area(polygons):
+    area = 0.0
+    for rings in polygons:
+        area += ring_area(rings[0]) - sum(ring_area(hole) for hole in rings[1:])
+    return area
+
+
+class Topology:
+    # Quantized rings split into arcs at junctions, with shared arcs stored
+    # once so neighbouring regions are simplified identically along borders
+
+    def __init__(self, geojson, quantization=QUANTIZATION):
+        points = np.array([xy for f in geojson["features"]
+                           for rings in _polygons(f["geometry"])
+                           for ring in rings for xy in ring], dtype=float)
+        self.origin = points.min(axis=0)
+        self.scale = (points.max(axis=0) - self.origin) / (quantization - 1)
+        self.features = geojson["features"]
+        self.arcs = []
+        self._arc_index = {}
+
+        rings = [[self.quantize(ring) for ring in rings]
+                 for f in self.features for rings in _polygons(f["geometry"])]
+        junctions = self._junctions(rings)
+
+        # Each feature is a list of polygons, each a list of rings, each a list of arc refs
+        rings = iter(rings)
+        self.shapes = []
+        for f in self.features:
+            self.shapes.append([[self._ring_arcs(ring, junctions) for ring in next(rings)]
+                                for _ in _polygons(f["geometry"])])
+
+    def quantize(self, ring):
+        q = np.round((np.asarray(ring, dtype=float) - self.origin) / self.scale).astype(np.int64)
+        # Drop repeated points created by snapping to the grid
+        keep = np.ones(len(q), dtype=bool)
+        keep[1:] = (q[1:] != q[:-1]).any(axis=1)
+        return q[keep]
+
+    def dequantize(self, q):
+        return q * self.scale + self.origin
+
+    @staticmethod
+    def _junctions(all_rings):
+        # A point is a junction where the rings passing through it disagree
+        # on their neighbours, i.e. where a shared border starts or ends
+        neighbours = {}
+        junctions = set()
+        for rings in all_rings:
+            for ring in rings:
+                open_ring = [tuple(p) for p in ring[:-1]]
+                n = len(open_ring)
+                for i, point in enumerate(open_ring):
+                    pair = frozenset((open_ring[i - 1], open_ring[(i + 1) % n]))
+                    seen = neighbours.setdefault(point, pair)
+                    if seen != pair:
+                        junctions.add(point)
+        return junctions
+
+    def _add_arc(self, arc):
+        key = tuple(map(tuple, arc))
+        if key in self._arc_index:
+            return self._arc_index[key]
+        reverse = key[::-1]
+        if reverse in self._arc_index:
+            return ~self._arc_index[reverse]
+        self._arc_index[key] = len(self.arcs)
+        self.arcs.append(arc)
+        return len(self.arcs) - 1
+
+    def _ring_arcs(self, ring, junctions):
+        open_ring = ring[:-1]
+        cuts = [i for i, p in enumerate(map(tuple, open_ring)) if p in junctions]
+        if not cuts:
+            # Start island rings at a canonical point so identical rings match
+            start = int(np.lexsort(open_ring.T[::-1])[0])
+            rotated = np.roll(open_ring, -start, axis=0)
+            return [self._add_arc(np.vstack([rotated, rotated[:1]]))]
+
+        rotated = np.roll(open_ring, -cuts[0], axis=0)
+        rotated = np.vstack([rotated, rotated[:1]])
+        offsets = [c - cuts[0] for c in cuts] + [len(open_ring)]
+        return [self._add_arc(rotated[a:b + 1]) for a, b in zip(offsets[:-1], offsets[1:])]
+
+    def simplified_arcs(self, tolerance):
+        tol = tolerance / self.scale.max()
+        return [arc[douglas_peucker(arc, tol)] for arc in self.arcs]
+
+    def to_geojson(self, tolerance, digits=None):
+        arcs = self.simplified_arcs(tolerance)
+        min_area = (tolerance / self.scale.max()) ** 2
+        digits = digits if digits is not None else max(3, int(np.ceil(-np.log10(tolerance))) + 1)
+
+        features = []
+        for f, shape in zip(self.features, self.shapes):
+            polygons = []
+            for refs in shape:
+                rings = [self._assemble(arcs, ring_refs) for ring_refs in refs]
+                # Drop collapsed rings and islands smaller than the tolerance
+                if len(rings[0]) < 4 or ring_area(rings[0]) < min_area:
+                    continue
+                rings = [rings[0]] + [r for r in rings[1:] if len(r) >= 4 and ring_area(r) >= min_area]
+                polygons.append([np.round(self.dequantize(r), digits).tolist() for r in rings])
+            features.append({
+                "type": "Feature",
+                "id": f.get("id"),
+                "properties": {"name": f["properties"]["name"]},
+                "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+            })
+        return {"type": "FeatureCollection", "features": features}
+
+    @staticmethod
+    def _assemble(arcs, refs):
+        parts = []
+        for ref in refs:
+            arc = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+            parts.append(arc if not parts else arc[1:])
+        return np.vstack(parts)
+
+
+def douglas_peucker(points, tolerance):
+    # Returns the indices to keep; endpoints are always kept so arcs still meet
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    pts = points.astype(float)
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        segment = pts[b] - pts[a]
+        rel = pts[a + 1:b] - pts[a]
+        length = np.hypot(*segment)
+        if length == 0:
+            # Closed arc: measure distance to the shared endpoint
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(segment[0] * rel[:, 1] - segment[1] * rel[:, 0]) / length
+        i = int(dist.argmax())
+        if dist[i] > tolerance:
+            split = a + 1 + i
+            keep[split] = True
+            stack.append((a, split))
+            stack.append((split, b))
+    return np.flatnonzero(keep)
+
+
+def level_path(tolerance, digest, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"regions-{digest[:16]}-v{SIMPLIFY_VERSION}-{tolerance:g}.geojson")
+
+
+def area_error(source, simplified):
+    errors = []
+    for f, s in zip(source["features"], simplified["features"]):
+        original = feature_area([[np.asarray(r) for r in rings] for rings in _polygons(f["geometry"])])
+        reduced = feature_area([[np.asarray(r) for r in rings] for rings in s["geometry"]["coordinates"]])
+        errors.append(abs(reduced - original) / original)
+    return max(errors)
+
+
+def build_levels(source=SOURCE_FILE, cache_dir=CACHE_DIR, levels=LEVELS):
+    with open(source, "r") as f:
+        geojson = json.load(f)
+    digest = file_digest(source)
+    topology = Topology(geojson)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    report = []
+    for tolerance in levels:
+        simplified = topology.to_geojson(tolerance)
+        target = level_path(tolerance, digest, cache_dir)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(simplified, f, separators=(",", ":"))
+        os.replace(tmp, target)
+        report.append({
+            "tolerance": tolerance,
+            "points": sum(len(r) for feat in simplified["features"]
+                          for rings in feat["geometry"]["coordinates"] for r in rings),
+            "bytes": os.path.getsize(target),
+            "area_error": area_error(geojson, simplified),
+        })
+
+    # Remember which level is the coarsest acceptable one
+    acceptable = [r["tolerance"] for r in report if r["area_error"] <= MAX_AREA_ERROR]
+    chosen = max(acceptable) if acceptable else min(levels)
+    with open(os.path.join(cache_dir, f"regions-{digest[:16]}-v{SIMPLIFY_VERSION}.json"), "w") as f:
+        json.dump({"chosen": chosen, "levels": report}, f, indent=2)
+    return chosen, report
+
+
+def load_geometry(tolerance=None, source=SOURCE_FILE, cache_dir=CACHE_DIR):
+    # Simplified GeoJSON for the map, built once and cached on disk and in memory
+    key = (tolerance, source)
+    if key in _loaded:
+        return _loaded[key]
+
+    digest = file_digest(source)
+    manifest = os.path.join(cache_dir, f"regions-{digest[:16]}-v{SIMPLIFY_VERSION}.json")
+    if not os.path.exists(manifest):
+        build_levels(source, cache_dir)
+    if tolerance is None:
+        with open(manifest, "r") as f:
+            tolerance = json.load(f)["chosen"]
+    if not os.path.exists(level_path(tolerance, digest, cache_dir)):
+        build_levels(source, cache_dir, levels=sorted(set(LEVELS) | {tolerance}))
+
+    with open(level_path(tolerance, digest, cache_dir), "r") as f:
+        _loaded[key] = json.load(f)
+    return _loaded[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute simplified region geometry for the map")
+    parser.add_argument("--source", default=SOURCE_FILE)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    chosen, report = build_levels(args.source, args.cache_dir)
+    print(f"{'tolerance':>10} {'points':>8} {'KB':>8} {'area error':>11}")
+    for r in report:
+        marker = "  <- used" if r["tolerance"] == chosen else ""
+        print(f"{r['tolerance']:>10g} {r['points']:>8} {r['bytes'] / 1e3:>8.1f} {r['area_error']:>10.2%}{marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import argparse
+import functools
+import json
+import os
+import re
+import time
+import unicodedata
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from Geomap.simplify import CACHE_DIR, SOURCE_FILE, _polygons, file_digest
+
+# Bump whenever the index arrays change shape so cached indexes get rebuilt
+INDEX_VERSION = 1
+
+# Children per R-tree node, and roughly how many edges share a horizontal strip
+NODE_CAPACITY = 8
+EDGES_PER_STRIP = 32
+
+# Crossing tests are done in blocks of at most this many point x edge pairs
+BLOCK_SIZE = 1 << 20
+
+# Names the data may use for each region feature of regioner_geo2.json
+REGION_ALIASES = {
+    "Capital Region of Denmark": ["Region Hovedstaden", "Hovedstaden"],
+    "Region Zealand": ["Region Sjælland", "Sjælland", "Region Sjaelland", "Zealand"],
+    "Region of Southern Denmark": ["Region Syddanmark", "Syddanmark"],
+    "Central Denmark Region": ["Region Midtjylland", "Midtjylland"],
+    "North Denmark Region": ["Region Nordjylland", "Nordjylland"],
+}
+
+_indexes = {}
+
+
+def repair_text(name):
+    # UTF-8 bytes that were decoded as latin-1 ("SjÃ¦lland") get decoded again
+    try:
+        return name.encode("latin-1").decode("utf-8")
+    except UnicodeError:
+        return name
+
+
+def name_key(name):
+    # Case and spacing are ignored and every non-ASCII letter is a wildcard, so
+    # "Region Sjælland", "REGION SJÆLLAND" and a lossy "Region Sj�lland"
+    # share one key
+    name = unicodedata.normalize("NFC", repair_text(str(name))).casefold()
+    name = re.sub(r"\s+", " ", name).strip()
+    return "".join(c if c.isascii() else "?" for c in name)
+
+
+@functools.lru_cache(maxsize=None)
+def join_index(features=tuple(REGION_ALIASES)):
+    # name key -> feature name, for the feature names themselves and their aliases
+    index = {}
+    for feature in features:
+        for name in [feature] + REGION_ALIASES.get(feature, []):
+            index.setdefault(name_key(name), feature)
+    return index
+
+
+def match_regions(names, features=tuple(REGION_ALIASES)):
+    # Feature name for every value of `names`, None where nothing matches;
+    # each distinct value is looked up once
+    index = join_index(features)
+    names = pd.Series(names)
+    unique = names.dropna().unique()
+    mapping = {name: index.get(name_key(name)) for name in unique}
+    return names.map(mapping).to_numpy(dtype=object)
+
+
+def _bbox(points):
+    return np.r_[points.min(axis=0), points.max(axis=0)]
+
+
+def str_pack(boxes, capacity=NODE_CAPACITY):
+    # One Sort-Tile-Recursive level: children ordered into vertical slices by x
+    # and then by y, grouped `capacity` at a time into parent nodes
+    n = len(boxes)
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    slices = int(np.ceil(np.sqrt(np.ceil(n / capacity))))
+    per_slice = slices * capacity
+    order = np.argsort(centers[:, 0], kind="stable")
+    order = np.concatenate([chunk[np.argsort(centers[chunk, 1], kind="stable")]
+                            for chunk in np.split(order, np.arange(per_slice, n, per_slice))])
+    starts = np.arange(0, n, capacity)
+    stops = np.minimum(starts + capacity, n)
+    parents = np.array([np.r_[boxes[order[a:b], :2].min(axis=0), boxes[order[a:b], 2:].max(axis=0)]
+                        for a, b in zip(starts, stops)])
+    return order, starts, stops, parents
+
+
+class RegionIndex:
+    # Packed R-tree over the bounding boxes of every polygon, with each
+    # polygon's edges bucketed into horizontal strips, so assigning a batch of
+    # points only runs crossing tests against the few edges near each point
+
+    ARRAYS = ["edges", "part_feature", "part_bbox", "part_edges", "part_strips",
+              "strip_ptr", "strip_edges"]
+
+    def __init__(self, names, ids, arrays, levels):
+        self.names = names
+        self.ids = ids
+        for key in self.ARRAYS:
+            setattr(self, key, arrays[key])
+        self.levels = levels
+
+    @classmethod
+    def from_geojson(cls, geojson):
+        names, ids = [], []
+        edges, part_feature, part_bbox, part_edges = [], [], [], []
+        n_edges = 0
+        for position, feature in enumerate(geojson["features"]):
+            names.append(feature["properties"]["name"])
+            ids.append(feature.get("id"))
+            for rings in _polygons(feature["geometry"]):
+                start = n_edges
+                for ring in rings:
+                    ring = np.asarray(ring, dtype=float)[:, :2]
+                    if (ring[0] != ring[-1]).any():
+                        ring = np.vstack([ring, ring[:1]])
+                    edges.append(np.hstack([ring[:-1], ring[1:]]))
+                    n_edges += len(ring) - 1
+                part_feature.append(position)
+                part_bbox.append(_bbox(np.asarray(rings[0], dtype=float)[:, :2]))
+                part_edges.append((start, n_edges))
+
+        arrays = {
+            "edges": np.vstack(edges),
+            "part_feature": np.array(part_feature, dtype=np.int32),
+            "part_bbox": np.array(part_bbox),
+            "part_edges": np.array(part_edges, dtype=np.int64),
+        }
+        arrays.update(cls._strips(arrays["edges"], arrays["part_bbox"], arrays["part_edges"]))
+
+        # Leaves hold polygons; every level above groups the one below until one root remains
+        levels = []
+        boxes = arrays["part_bbox"]
+        while not levels or len(boxes) > 1:
+            order, starts, stops, boxes = str_pack(boxes)
+            levels.append({"order": order, "start": starts, "stop": stops, "bbox": boxes})
+        return cls(names, ids, arrays, levels)
+
+    @staticmethod
+    def _strips(edges, part_bbox, part_edges):
+        # CSR of edge indices per strip, strips of all polygons concatenated
+        part_strips, pointers, members = [], [np.zeros(1, dtype=np.int64)], []
+        offset = n_strips = 0
+        for (a, b), box in zip(part_edges, part_bbox):
+            count = max(1, int(np.ceil((b - a) / EDGES_PER_STRIP)))
+            height = (box[3] - box[1]) / count or 1.0
+            y = edges[a:b, [1, 3]]
+            first = np.clip(((y.min(axis=1) - box[1]) // height).astype(np.int64), 0, count - 1)
+            last = np.clip(((y.max(axis=1) - box[1]) // height).astype(np.int64), 0, count - 1)
+            spans = last - first + 1
+            edge_ids = np.repeat(np.arange(a, b), spans)
+            strip_ids = np.repeat(first, spans) + np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+            order = np.argsort(strip_ids, kind="stable")
+            members.append(edge_ids[order])
+            pointers.append(offset + np.cumsum(np.bincount(strip_ids, minlength=count)))
+            part_strips.append((n_strips, count, height))
+            offset += len(edge_ids)
+            n_strips += count
+        return {
+            "part_strips": np.array(part_strips),
+            "strip_ptr": np.concatenate(pointers),
+            "strip_edges": np.concatenate(members),
+        }
+
+    def to_npz(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        levels = {f"level{i}_{key}": value for i, level in enumerate(self.levels) for key, value in level.items()}
+        np.savez(tmp, names=np.array(self.names), ids=np.array([str(i) for i in self.ids]),
+                 **{key: getattr(self, key) for key in self.ARRAYS}, **levels)
+        os.replace(tmp, path)
+
+    @classmethod
+    def from_npz(cls, path):
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in cls.ARRAYS}
+            levels = []
+            while f"level{len(levels)}_order" in data:
+                i = len(levels)
+                levels.append({key: data[f"level{i}_{key}"] for key in ("order", "start", "stop", "bbox")})
+            return cls(data["names"].tolist(), data["ids"].tolist(), arrays, levels)
+
+    def assign(self, lon, lat):
+        # Position of the feature containing each point, -1 outside every region
+        x = np.asarray(lon, dtype=float).ravel()
+        y = np.asarray(lat, dtype=float).ravel()
+        result = np.full(len(x), -1, dtype=np.int32)
+        candidates = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        top = len(self.levels) - 1
+        self._search(top, np.arange(len(self.levels[top]["bbox"])), candidates, x, y, result)
+        return result
+
+    def regions(self, lon, lat):
+        # Feature names as a categorical, NaN outside every region
+        codes = self.assign(lon, lat)
+        return pd.Categorical.from_codes(codes, categories=self.names)
+
+    def _search(self, depth, nodes, points, x, y, result):
+        level = self.levels[depth]
+        for node in nodes:
+            xmin, ymin, xmax, ymax = level["bbox"][node]
+            inside = points[(x[points] >= xmin) & (x[points] <= xmax) & (y[points] >= ymin) & (y[points] <= ymax)]
+            inside = inside[result[inside] < 0]
+            if not len(inside):
+                continue
+            children = level["order"][level["start"][node]:level["stop"][node]]
+            if depth:
+                self._search(depth - 1, children, inside, x, y, result)
+            else:
+                for part in children:
+                    self._contains(part, inside[result[inside] < 0], x, y, result)
+
+    def _contains(self, part, points, x, y, result):
+        xmin, ymin, xmax, ymax = self.part_bbox[part]
+        points = points[(x[points] >= xmin) & (x[points] <= xmax) & (y[points] >= ymin) & (y[points] <= ymax)]
+        if not len(points):
+            return
+        first, count, height = self.part_strips[part]
+        strip = np.clip(((y[points] - ymin) // height).astype(np.int64), 0, int(count) - 1)
+        order = np.argsort(strip, kind="stable")
+        points, strip = points[order], strip[order]
+        bounds = np.flatnonzero(np.r_[True, strip[1:] != strip[:-1], True])
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            s = int(first) + strip[a]
+            edges = self.edges[self.strip_edges[self.strip_ptr[s]:self.strip_ptr[s + 1]]]
+            block = max(1, BLOCK_SIZE // max(1, len(edges)))
+            for start in range(a, b, block):
+                ids = points[start:min(start + block, b)]
+                inside = crossings(x[ids], y[ids], edges) % 2 == 1
+                result[ids[inside]] = self.part_feature[part]
+
+
+def crossings(px, py, edges):
+    # Even-odd ray casting: edges crossed by a ray from each point towards +x
+    x0, y0, x1, y1 = (edges[:, i][None, :] for i in range(4))
+    px, py = px[:, None], py[:, None]
+    straddles = (y0 > py) != (y1 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cross_x = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+    return (straddles & (px < cross_x)).sum(axis=1)
+
+
+def index_path(digest, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"index-{digest[:16]}-v{INDEX_VERSION}.npz")
+
+
+def get_index(source=SOURCE_FILE, cache_dir=CACHE_DIR):
+    # Built from the full-resolution geometry once, cached on disk and in memory
+    if source in _indexes:
+        return _indexes[source]
+
+    path = index_path(file_digest(source), cache_dir)
+    if os.path.exists(path):
+        index = RegionIndex.from_npz(path)
+    else:
+        with open(source, "r") as f:
+            index = RegionIndex.from_geojson(json.load(f))
+        os.makedirs(cache_dir, exist_ok=True)
+        index.to_npz(path)
+    _indexes[source] = index
+    return index
+
+
+def rollup(frame, value="Value", lon="lon", lat="lat", by=(), index=None):
+    # Sum geocoded rows (shelters, municipality centroids) per region feature
+    index = get_index() if index is None else index
+    regions = index.regions(frame[lon].to_numpy(), frame[lat].to_numpy())
+    outside = int(pd.isna(regions).sum())
+    if outside:
+        warnings.warn(f"{outside} of {len(frame)} points fall outside every region and are left out", stacklevel=2)
+    keys = [pd.Series(regions, index=frame.index, name="Region")] + [frame[k] for k in by]
+    return frame.groupby(keys, observed=True)[value].sum().reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the region spatial index and time point assignment")
+    parser.add_argument("--source", default=SOURCE_FILE)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--points", type=int, default=1_000_000, help="random points to assign")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.source, "r") as f:
+        index = RegionIndex.from_geojson(json.load(f))
+    build = time.perf_counter() - start
+    os.makedirs(args.cache_dir, exist_ok=True)
+    index.to_npz(index_path(file_digest(args.source), args.cache_dir))
+
+    rng = np.random.default_rng(0)
+    box = index.levels[-1]["bbox"][0]
+    lon = rng.uniform(box[0], box[2], args.points)
+    lat = rng.uniform(box[1], box[3], args.points)
+    start = time.perf_counter()
+    regions = index.regions(lon, lat)
+    assign = time.perf_counter() - start
+
+    print(f"Index of {len(index.part_feature)} polygons and {len(index.edges)} edges built in {build * 1e3:.0f} ms")
+    print(f"Assigned {args.points:,} points in {assign * 1e3:.0f} ms")
+    print(pd.Series(regions).value_counts(dropna=False).to_string())
+
+
+if __name__ == "__main__":
+    main()
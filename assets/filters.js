@@ -0,0 +1,251 @@
+// Client-side versions of the dashboard's filter callbacks. The cube and the
+// figure templates are downloaded once (see client_data_asset in
+// dashboard.py); after that every filter change is drawn in the browser
+// without a request to the server. Each function mirrors the Python callback
+// of the same name and returns the same figures.
+(function () {
+    var loaded = {};
+
+    function load(url) {
+        if (!loaded[url]) {
+            loaded[url] = fetch(url).then(function (response) {
+                if (!response.ok) {
+                    throw new Error("Could not load " + url + ": " + response.status);
+                }
+                return response.json();
+            }).then(index);
+        }
+        return loaded[url];
+    }
+
+    function key() {
+        return Array.prototype.join.call(arguments, "|");
+    }
+
+    function push(map, name, row) {
+        (map[name] = map[name] || []).push(row);
+    }
+
+    // The same lookups as Data.cube.Cube: rows arrive sorted by series and
+    // year, so every group below keeps the cube's category order
+    function index(data) {
+        var cube = data.cube, keys = cube.keys;
+        var column = function (name) {
+            var categories = keys[name].categories;
+            return keys[name].codes.map(function (code) { return categories[code]; });
+        };
+        var dimension = column("Dimension"), category = column("Category");
+        var resident = column("Resident"), duration = column("Duration");
+        data.values = {};
+        data.series = {};
+        data.byCategory = {};
+        data.byDuration = {};
+        for (var i = 0; i < cube.Value.length; i++) {
+            var row = {
+                Category: category[i], Duration: duration[i], Year: cube.Year[i], Value: cube.Value[i]
+            };
+            data.values[key(dimension[i], category[i], resident[i], duration[i], row.Year)] = row.Value;
+            push(data.series, key(dimension[i], category[i], resident[i], duration[i]), row);
+            push(data.byCategory, key(dimension[i], resident[i], duration[i], row.Year), row);
+            push(data.byDuration, key(dimension[i], category[i], resident[i], row.Year), row);
+        }
+        return data;
+    }
+
+    function pluck(rows, field) {
+        return rows.map(function (row) { return row[field]; });
+    }
+
+    function labelsColumn(name, n) {
+        var column = [];
+        for (var i = 0; i < n; i++) {
+            column.push([name]);
+        }
+        return column;
+    }
+
+    function thousands(n) {
+        return String(n).replace(/\B(?=(\d{3})+(?!\d))/g, ",");
+    }
+
+    function trace(template, name, fields) {
+        return Object.assign({}, template.traces[name], fields);
+    }
+
+    function figure(template, traces, layout) {
+        return {data: traces, layout: Object.assign({}, template.layout, layout || {})};
+    }
+
+    function yearAnnotation(template, year) {
+        return [Object.assign({}, template.layout.annotations[0], {text: "Year: " + year})];
+    }
+
+    function ordered(data, residents) {
+        return data.residents.filter(function (r) { return (residents || []).indexOf(r) !== -1; });
+    }
+
+    function breakdown(data, region, ageGroup) {
+        if (ageGroup && ageGroup !== data.all_ages) {
+            return ["Age", ageGroup];
+        }
+        return ["Region", region || data.all_regions];
+    }
+
+    // Same traces as forecast_traces in dashboard.py: the band's upper and
+    // lower edges, then the dashed projection, in the series' legend group
+    function forecastTraces(data, template, resident, forecast) {
+        var color = template.traces[resident].line.color;
+        var common = {
+            type: "scatter", mode: "lines", x: forecast.Year, legendgroup: resident, showlegend: false
+        };
+        return [
+            Object.assign({}, common, {y: forecast.Upper, line: {width: 0}, hoverinfo: "skip"}),
+            Object.assign({}, common, {
+                y: forecast.Lower, line: {width: 0}, hoverinfo: "skip",
+                fill: "tonexty", fillcolor: color.replace("rgb(", "rgba(").replace(")", ", 0.15)")
+            }),
+            Object.assign({}, common, {
+                y: forecast.Value, name: resident + " (projected)",
+                line: {color: color, dash: "dash"}, hovertemplate: data.forecast_hover,
+                customdata: forecast.Year.map(function (year, i) {
+                    return [resident, forecast.Lower[i], forecast.Upper[i]];
+                })
+            })
+        ];
+    }
+
+    function prevent() {
+        throw window.dash_clientside.PreventUpdate;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        filters: {
+            update_kpis: function (year, url) {
+                return load(url).then(function (data) {
+                    var value = function (resident) {
+                        var v = data.values[key(data.national[0], data.national[1], resident, "Total", year)];
+                        return thousands(v == null ? 0 : v);
+                    };
+                    var trend = function (resident) {
+                        return data.kpi_trends[resident][year] || "";
+                    };
+                    return [value("Women"), value("Children"), String(year), String(year),
+                            trend("Women"), trend("Children")];
+                });
+            },
+
+            update_line_chart: function (residents, region, ageGroup, url) {
+                return load(url).then(function (data) {
+                    var template = data.templates.line, by = breakdown(data, region, ageGroup);
+                    var traces = [];
+                    ordered(data, residents).forEach(function (resident) {
+                        var rows = data.series[key(by[0], by[1], resident, "Total")];
+                        if (rows) {
+                            traces.push(trace(template, resident, {
+                                x: pluck(rows, "Year"), y: pluck(rows, "Value"),
+                                customdata: labelsColumn(resident, rows.length)
+                            }));
+                        }
+                    });
+                    ordered(data, residents).forEach(function (resident) {
+                        var forecast = ((data.forecasts[by[0]] || {})[by[1]] || {})[resident];
+                        if (forecast) {
+                            traces = traces.concat(forecastTraces(data, template, resident, forecast));
+                        }
+                    });
+                    return figure(template, traces);
+                });
+            },
+
+            update_pie_chart: function (year, resident, url) {
+                return load(url).then(function (data) {
+                    var template = data.templates.pie[resident];
+                    var rows = data.byCategory[key("Age", resident, "Total", year)] || [];
+                    var labels = pluck(rows, "Category");
+                    var pie = trace(template, "", {
+                        labels: labels, values: pluck(rows, "Value"),
+                        customdata: labels.map(function (label) { return [label]; }),
+                        marker: {colors: labels.map(function (label) { return data.age_colors[label] || null; })}
+                    });
+                    return figure(template, [pie], {annotations: yearAnnotation(template, year)});
+                });
+            },
+
+            update_bar_chart: function (year, residents, region, ageGroup, url) {
+                return load(url).then(function (data) {
+                    var template = data.templates.bar, by = breakdown(data, region, ageGroup);
+                    var traces = [];
+                    ordered(data, residents).forEach(function (resident) {
+                        var rows = (data.byDuration[key(by[0], by[1], resident, year)] || []).filter(function (row) {
+                            return data.durations.indexOf(row.Duration) !== -1;
+                        });
+                        if (rows.length) {
+                            traces.push(trace(template, resident, {
+                                x: pluck(rows, "Duration"), y: pluck(rows, "Value"),
+                                customdata: labelsColumn(resident, rows.length)
+                            }));
+                        }
+                    });
+                    return figure(template, traces, {annotations: yearAnnotation(template, year)});
+                });
+            },
+
+            update_geomap: function (visible, resident, url) {
+                if (!visible) {
+                    prevent();
+                }
+                return load(url).then(function (data) {
+                    // Year x map region matrix of the region series, as create_geomap builds it
+                    var cells = {}, years = [], regions = [], max = null;
+                    Object.keys(data.map_regions).forEach(function (region) {
+                        var feature = data.map_regions[region];
+                        (data.series[key("Region", region, resident, "Total")] || []).forEach(function (row) {
+                            if (years.indexOf(row.Year) === -1) { years.push(row.Year); }
+                            if (regions.indexOf(feature) === -1) { regions.push(feature); }
+                            cells[key(row.Year, feature)] = (cells[key(row.Year, feature)] || 0) + (row.Value || 0);
+                            if (row.Value != null && (max === null || row.Value > max)) { max = row.Value; }
+                        });
+                    });
+                    years.sort(function (a, b) { return a - b; });
+                    regions.sort();
+                    var row = function (year) {
+                        return regions.map(function (feature) {
+                            var v = cells[key(year, feature)];
+                            return v === undefined ? null : v;
+                        });
+                    };
+                    var fill = function (value) {
+                        return regions.map(function () { return value; });
+                    };
+
+                    var template = data.templates.geomap, base = template.traces[""];
+                    var layout = template.layout, slider = layout.sliders[0];
+                    var step = slider.steps[0];
+                    var map = trace(template, "", {
+                        locations: regions, z: row(years[0]), customdata: fill(years[0]),
+                        hovertemplate: base.hovertemplate.replace(/<b>[^<]*:<\/b> %\{z\}/, "<b>" + resident + ":</b> %{z}")
+                    });
+                    var result = figure(template, [map], {
+                        coloraxis: Object.assign({}, layout.coloraxis, {
+                            cmax: max,
+                            colorbar: Object.assign({}, layout.coloraxis.colorbar, {title: {text: resident}})
+                        }),
+                        sliders: [Object.assign({}, slider, {
+                            steps: years.map(function (year) {
+                                return Object.assign({}, step, {label: String(year), args: [[String(year)], step.args[1]]});
+                            })
+                        })],
+                        title: Object.assign({}, layout.title, {text: resident + " by Region of Residence and Time"})
+                    });
+                    result.frames = years.map(function (year) {
+                        return {
+                            data: [{type: base.type, z: row(year), customdata: fill(year)}],
+                            name: String(year), traces: [0]
+                        };
+                    });
+                    return result;
+                });
+            }
+        }
+    });
+})();
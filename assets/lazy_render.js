@@ -0,0 +1,21 @@
+// Marks a component as visible the first time it scrolls into view, so the
+// server only renders figures the user actually looks at.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    lazy: {
+        observe: function (containerId) {
+            var element = document.getElementById(containerId);
+            var target = containerId.replace(/-container$/, "-visible");
+            if (!element || !("IntersectionObserver" in window)) {
+                return true;
+            }
+            var observer = new IntersectionObserver(function (entries) {
+                if (entries.some(function (entry) { return entry.isIntersecting; })) {
+                    observer.disconnect();
+                    window.dash_clientside.set_props(target, {data: true});
+                }
+            });
+            observer.observe(element);
+            return window.dash_clientside.no_update;
+        }
+    }
+});
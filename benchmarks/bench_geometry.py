@@ -0,0 +1,40 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Data import store
+from Geomap.simplify import LEVELS, SOURCE_FILE, build_levels, file_digest, level_path
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    # Payload size and build/serialize latency of the map for the raw and simplified geometry
+    from dashboard import create_geomap
+
+    chosen, _ = build_levels()
+    digest = file_digest(SOURCE_FILE)
+    shelter_df = store.region_trend()
+
+    variants = [("source", SOURCE_FILE)] + [(f"{t:g}", level_path(t, digest)) for t in LEVELS]
+    print(f"{'geometry':>10} {'file KB':>9} {'load ms':>8} {'build ms':>9} {'encode ms':>10} {'figure KB':>10}")
+    for name, path in variants:
+        with open(path, "r") as f:
+            text = f.read()
+        geojson, load = timed(lambda: json.loads(text))
+        fig, build = timed(lambda: create_geomap(shelter_df, geojson))
+        payload, encode = timed(fig.to_json)
+        marker = "  <- used" if name == f"{chosen:g}" else ""
+        print(f"{name:>10} {len(text) / 1e3:>9.1f} {load * 1e3:>8.1f} {build * 1e3:>9.1f} "
+              f"{encode * 1e3:>10.1f} {len(payload) / 1e3:>10.1f}{marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The figures are compared as the server sends them; client-side filtering
+# is reported separately as its one-off download
+os.environ.setdefault("DASHBOARD_CLIENTSIDE", "off")
+
+from benchmarks.load_test import figure_request
+
+# Filter changes a user makes after the first render: (label, output, inputs, changed input)
+INTERACTIONS = [
+    ("year -> 2020 (pie)", "pie-chart.figure",
+     [("year-filter", "value", 2020), ("pie-resident", "value", "Women")], "year-filter.value"),
+    ("pie resident -> Children", "pie-chart.figure",
+     [("year-filter", "value", 2020), ("pie-resident", "value", "Children")], "pie-resident.value"),
+    ("year -> 2020 (bar)", "bar-chart.figure",
+     [("year-filter", "value", 2020), ("bar-residents", "value", ["Women", "Children"]),
+      ("region-filter", "value", "All Denmark"), ("age-filter", "value", "All ages")], "year-filter.value"),
+    ("region -> Hovedstaden (bar)", "bar-chart.figure",
+     [("year-filter", "value", 2020), ("bar-residents", "value", ["Women", "Children"]),
+      ("region-filter", "value", "Region Hovedstaden"), ("age-filter", "value", "All ages")], "region-filter.value"),
+    ("region -> Hovedstaden (line)", "line-chart.figure",
+     [("line-residents", "value", ["Stays", "Women", "Children"]),
+      ("region-filter", "value", "Region Hovedstaden"), ("age-filter", "value", "All ages")], "region-filter.value"),
+    ("line residents -> Women", "line-chart.figure",
+     [("line-residents", "value", ["Women"]),
+      ("region-filter", "value", "Region Hovedstaden"), ("age-filter", "value", "All ages")], "line-residents.value"),
+    ("map resident -> Women", "geomap.figure",
+     [("geomap-visible", "data", True), ("map-resident", "value", "Women")], "map-resident.value"),
+]
+
+
+def response_size(client, request):
+    response = client.post("/_dash-update-component", json=request)
+    body = response.get_data()
+    return len(body), len(gzip.compress(body))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response bytes per filter interaction: full figure vs Dash Patch")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    from dashboard import app, client_data_asset
+    client = app.server.test_client()
+
+    results = []
+    for label, output, inputs, changed in INTERACTIONS:
+        # Without changedPropIds the callback treats the call as a first render
+        full = response_size(client, figure_request(output, inputs))
+        patch = response_size(client, {**figure_request(output, inputs), "changedPropIds": [changed]})
+        results.append({"interaction": label, "full": full[0], "full_gzip": full[1],
+                        "patch": patch[0], "patch_gzip": patch[1]})
+
+    data = client_data_asset()
+    clientside = {"download": len(data), "download_gzip": len(gzip.compress(data)), "per_interaction": 0}
+
+    if args.json:
+        print(json.dumps({"interactions": results, "clientside": clientside}, indent=2))
+        return
+
+    print(f"{'interaction':<30} {'full B':>9} {'patch B':>9} {'saved':>7} {'full gz':>9} {'patch gz':>9}")
+    for r in results:
+        saved = 1 - r["patch"] / r["full"]
+        print(f"{r['interaction']:<30} {r['full']:>9,} {r['patch']:>9,} {saved:>7.1%} "
+              f"{r['full_gzip']:>9,} {r['patch_gzip']:>9,}")
+    full, patch = sum(r["full"] for r in results), sum(r["patch"] for r in results)
+    print(f"{'total':<30} {full:>9,} {patch:>9,} {1 - patch / full:>7.1%}")
+    print(f"\nclient-side filtering: {clientside['download']:,} B once ({clientside['download_gzip']:,} B gzip), "
+          f"then no requests per interaction")
+
+
+if __name__ == "__main__":
+    main()
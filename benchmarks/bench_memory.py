@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Data.cube import add_measures
+from Data.normalize import combine_tidy, load_tidy
+from Data.statbank import clean_data, read_statbank
+from benchmarks.synthetic import write_dataset
+
+
+def as_legacy(df):
+    # The representation before typed columns: Python strings and 64-bit numbers
+    legacy = {}
+    for col, values in df.items():
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+            legacy[col] = values.astype(object)
+        elif pd.api.types.is_float_dtype(values.dtype):
+            legacy[col] = values.astype("float64")
+        else:
+            legacy[col] = values.astype("float64" if values.hasnans else "int64")
+    return pd.DataFrame(legacy)
+
+
+def megabytes(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory footprint of the typed tables against plain object/int64 ones")
+    parser.add_argument("--scale", type=int, default=100, help="synthetic dataset this many times the real one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = write_dataset(os.path.join(tmp, f"x{args.scale}"), args.scale)
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            wide = {name: (read_statbank(path), clean_data(path)) for name, path in files.items()}
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        tidy = combine_tidy([load_tidy(path, name) for name, path in files.items()])
+        cube = add_measures(tidy)
+
+    tables = [(f"wide[{name}]", raw, typed) for name, (raw, typed) in wide.items()]
+    tables += [("tidy", as_legacy(tidy), tidy), ("cube", as_legacy(cube), cube)]
+
+    print(f"scale {args.scale}x, {len(tidy):,} tidy rows")
+    print(f"{'table':<18} {'rows':>10} {'legacy MB':>10} {'typed MB':>10} {'saved':>7}")
+    for name, legacy, typed in tables:
+        before, after = megabytes(legacy), megabytes(typed)
+        print(f"{name:<18} {len(typed):>10,} {before:>10.1f} {after:>10.1f} {1 - after / before:>7.1%}")
+
+    print("\ncube dtypes")
+    for col, dtype in cube.dtypes.items():
+        print(f"  {col:<14} {dtype}")
+
+
+if __name__ == "__main__":
+    main()
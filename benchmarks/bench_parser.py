@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Data.statbank import read_statbank
+from benchmarks.synthetic import rows_for, write_export
+
+
+def legacy_clean_data(file_path):
+    # The original per-row parser from 01_data.py, kept for comparison
+    df = pd.read_csv(file_path, encoding='latin1')
+    df_cleaned = df.iloc[2:].reset_index(drop=True)
+    df_cleaned = df_cleaned.apply(lambda row: pd.Series(row.iloc[0].split(';')), axis=1)
+    df_cleaned.columns = df_cleaned.iloc[0]
+    df_cleaned = df_cleaned[1:]
+    df_cleaned = df_cleaned.apply(lambda col: col.map(lambda x: x.strip('" ') if isinstance(x, str) else x))
+    return df_cleaned
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the StatBank parser on synthetic exports")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-limit", type=int, default=100_000,
+                        help="skip the legacy parser above this many rows")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'rows':>10} {'MB':>7} {'new s':>8} {'rows/s':>12} {'legacy s':>9} {'speedup':>8}")
+        for n_rows in args.rows:
+            path = write_export(os.path.join(tmp, f"export_{n_rows}.csv"), n_sections=rows_for(n_rows))
+            size_mb = os.path.getsize(path) / 1e6
+            parsed = len(read_statbank(path))
+
+            new = best_of(lambda: read_statbank(path), args.repeat)
+            legacy = None
+            if n_rows <= args.legacy_limit:
+                legacy = best_of(lambda: legacy_clean_data(path), 1)
+
+            legacy_col = f"{legacy:9.3f}" if legacy else f"{'-':>9}"
+            speedup_col = f"{legacy / new:7.1f}x" if legacy else f"{'-':>8}"
+            print(f"{parsed:>10} {size_mb:7.1f} {new:8.3f} {parsed / new:12,.0f} {legacy_col} {speedup_col}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: import the app, then make the requests a
+# browser makes for the first page view, and report both timings
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import dashboard
+imported = time.perf_counter()
+
+import startup
+client = dashboard.server.test_client()
+for path in ("/", "/_dash-layout", "/_dash-dependencies"):
+    assert client.get(path).status_code == 200, path
+layout = json.loads(client.get("/_dash-layout").get_data())
+values = startup.layout_values(layout)
+for callback in dashboard.app._callback_list:
+    if not callback.get("clientside_function"):
+        client.post("/_dash-update-component", json=startup.callback_request(callback, values))
+if "client-data.data" in values:
+    assert client.get(values["client-data.data"]).status_code == 200
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_page": done - start,
+                  "pandas": type(sys.modules.get("pandas")).__name__ == "module"}))
+"""
+
+
+def cold_start(snapshot):
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    if not snapshot:
+        env["DASHBOARD_SNAPSHOT"] = "off"
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    # Wall time from launching the interpreter until the first page is answered
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time-to-first-response with and without the startup snapshot")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, os.path.join(ROOT, "startup.py")], cwd=ROOT, check=True)
+    print(f"{'mode':<12} {'import s':>9} {'first page s':>13} {'process s':>10} {'pandas':>7}")
+    for label, snapshot in (("full build", False), ("snapshot", True)):
+        runs = [cold_start(snapshot) for _ in range(args.repeat)]
+        median = {key: statistics.median(r[key] for r in runs) for key in ("import", "first_page", "process")}
+        print(f"{label:<12} {median['import']:>9.3f} {median['first_page']:>13.3f} {median['process']:>10.3f} "
+              f"{'yes' if runs[0]['pandas'] else 'no':>7}")
+
+
+if __name__ == "__main__":
+    main()
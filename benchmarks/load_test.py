@@ -0,0 +1,87 @@
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Filter states cycled through by the figure requests
+YEARS = [2017, 2018, 2019, 2020, 2021, 2022, 2023]
+REGIONS = ["All Denmark", "Region Hovedstaden", "Region Sjælland", "Region Syddanmark",
+           "Region Midtjylland", "Region Nordjylland"]
+RESIDENTS = ["Stays", "Stays with children", "Women", "Children"]
+
+
+def figure_request(output, inputs):
+    component, prop = output.split(".")
+    return {
+        "output": output,
+        "outputs": {"id": component, "property": prop},
+        "inputs": [{"id": i, "property": p, "value": v} for i, p, v in inputs],
+        "changedPropIds": [],
+    }
+
+
+def endpoints(i):
+    year = YEARS[i % len(YEARS)]
+    region = REGIONS[i % len(REGIONS)]
+    resident = RESIDENTS[i % len(RESIDENTS)]
+    return {
+        "layout": ("GET", "/_dash-layout", None),
+        "line": ("POST", "/_dash-update-component", figure_request("line-chart.figure", [
+            ("line-residents", "value", ["Stays", "Women", "Children"]),
+            ("region-filter", "value", region), ("age-filter", "value", "All ages")])),
+        "pie": ("POST", "/_dash-update-component", figure_request("pie-chart.figure", [
+            ("year-filter", "value", year), ("pie-resident", "value", resident)])),
+        "bar": ("POST", "/_dash-update-component", figure_request("bar-chart.figure", [
+            ("year-filter", "value", year), ("bar-residents", "value", ["Women", "Children"]),
+            ("region-filter", "value", region), ("age-filter", "value", "All ages")])),
+        "map": ("POST", "/_dash-update-component", figure_request("geomap.figure", [
+            ("geomap-visible", "data", True), ("map-resident", "value", resident)])),
+    }
+
+
+def timed_request(base_url, method, path, body):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        size = len(response.read())
+    return time.perf_counter() - start, size
+
+
+def run(base_url, name, requests, concurrency):
+    jobs = [endpoints(i)[name] for i in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda job: timed_request(base_url, *job), jobs))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(r[0] for r in results)
+    return {
+        "endpoint": name,
+        "requests": requests,
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1e3,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1e3,
+        "bytes": statistics.mean(r[1] for r in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a running dashboard server")
+    parser.add_argument("--url", default="http://127.0.0.1:8050")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoints", nargs="+", default=["layout", "line", "pie", "bar", "map"])
+    args = parser.parse_args()
+
+    print(f"{'endpoint':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'KB':>8}")
+    for name in args.endpoints:
+        r = run(args.url.rstrip("/"), name, args.requests, args.concurrency)
+        print(f"{r['endpoint']:>8} {r['rps']:>9.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['bytes'] / 1e3:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+import plotly
+
+from Data import store
+from Data.combine import combine_sources
+from Data.cube import Cube
+from Data.normalize import SOURCE_FILES, combine_tidy, load_tidy
+from Data.statbank import clean_data
+from Data.trends import Trends
+from benchmarks.synthetic import write_dataset
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SCALES = [1, 10, 100, 1000]
+
+
+def measure(func, repeat):
+    # Best wall time of `repeat` runs and the result of the last one
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def quiet(func):
+    # clean_data reports progress with print; keep the benchmark output readable
+    def wrapper():
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            return func()
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+    return wrapper
+
+
+def bench_dataset(files, repeat, figures):
+    from dashboard import (bar_figure, create_bar_chart, create_geomap, create_pie_chart,
+                           create_plot_line_chart, line_figure, pie_figure)
+
+    results = {}
+
+    def record(stage, func, **extra):
+        seconds, result = measure(func, repeat)
+        results[stage] = {"seconds": seconds, **extra}
+        return result
+
+    # Ingestion: the clean_data wrapper, the tidy normalizer and the keyed combine of 01_data.py
+    for name, path in files.items():
+        record(f"clean_data[{name}]", quiet(lambda p=path: clean_data(p)), bytes=os.path.getsize(path))
+
+    tidy_frames = [record(f"normalize[{name}]", lambda p=path, n=name: load_tidy(p, n))
+                   for name, path in files.items()]
+    combined = record("combine[01_data]", lambda: combine_sources(tidy_frames))
+    results["combine[01_data]"]["rows"] = len(combined)
+    tidy = record("combine[tidy]", lambda: combine_tidy(tidy_frames))
+    results["combine[tidy]"]["rows"] = len(tidy)
+    cube = record("aggregate[cube]", lambda: Cube(tidy))
+    record("aggregate[trends]", lambda: Trends.from_frame(cube.frame))
+
+    if not figures:
+        return results
+
+    # Figure construction from the cube views, then JSON encoding of each figure
+    year = cube.years[-1]
+    factories = {
+        "line": lambda: create_plot_line_chart(store.resident_trend(cube=cube)),
+        "pie": lambda: create_pie_chart(store.age_distribution(year, cube=cube), year),
+        "bar": lambda: create_bar_chart(store.duration_distribution(year, cube=cube), year),
+        "geomap": lambda: create_geomap(store.region_trend(cube=cube)),
+    }
+    for name, factory in factories.items():
+        fig = record(f"figure[{name}]", factory)
+        payload = record(f"to_json[{name}]", fig.to_json)
+        results[f"to_json[{name}]"]["bytes"] = len(payload)
+
+    # The same charts built by swapping data into the prebuilt figure templates
+    templates = {
+        "line": lambda: line_figure(store.resident_trend(cube=cube)),
+        "pie": lambda: pie_figure(store.age_distribution(year, cube=cube), year),
+        "bar": lambda: bar_figure(store.duration_distribution(year, cube=cube), year),
+    }
+    for name, factory in templates.items():
+        record(f"template[{name}]", factory)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)["runs"]
+    print(f"\nCompared with {baseline_path}")
+    print(f"{'scale':>6} {'stage':<24} {'before s':>10} {'after s':>10} {'change':>8}")
+    for scale, stages in current.items():
+        for stage, result in stages.items():
+            before = baseline.get(scale, {}).get(stage)
+            if before:
+                change = result["seconds"] / before["seconds"] - 1
+                print(f"{scale:>6} {stage:<24} {before['seconds']:>10.4f} {result['seconds']:>10.4f} {change:>+8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time ingestion, aggregation, figure construction and serialization")
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES,
+                        help="1 is the real data; larger values are synthetic datasets that many times bigger")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-figures-above", type=int, default=100,
+                        help="skip Plotly stages for scales above this")
+    parser.add_argument("--output", default=None, help="defaults to benchmarks/results/<timestamp>.json")
+    parser.add_argument("--compare", default=None, help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    runs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            files = SOURCE_FILES if scale == 1 else write_dataset(os.path.join(tmp, f"x{scale}"), scale)
+            figures = scale <= args.no_figures_above
+            runs[str(scale)] = bench_dataset(files, args.repeat if scale < 1000 else 1, figures)
+
+            print(f"\nscale {scale}x")
+            for stage, result in runs[str(scale)].items():
+                extra = f"  {result['bytes'] / 1e3:,.1f} KB" if result.get("bytes") else ""
+                print(f"  {stage:<24} {result['seconds'] * 1e3:>10.2f} ms{extra}")
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "plotly": plotly.__version__,
+        "repeat": args.repeat,
+        "runs": runs,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(runs, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Local stand-in for the StatBank download endpoint: serves a directory of
+# CSV exports with ETag/Last-Modified validators so Data.fetch can be
+# exercised without the network.
+#
+#   python benchmarks/statbank_server.py --port 8765
+#   STATBANK_URL=http://127.0.0.1:8765/ python -m Data.fetch
+import argparse
+import email.utils
+import hashlib
+import itertools
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK_SIZE = 16 * 1024
+
+
+def make_handler(directory, latency=0.0, fail_every=0):
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            with lock:
+                n = next(counter)
+            if fail_every and n % fail_every == 0:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            path = os.path.join(directory, os.path.basename(self.path.split("?")[0]))
+            if not path.endswith(".csv") or not os.path.isfile(path):
+                self.send_error(404)
+                return
+            with open(path, "rb") as f:
+                body = f.read()
+            etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            modified = email.utils.formatdate(int(os.path.getmtime(path)), usegmt=True)
+
+            # If-None-Match wins over If-Modified-Since, as in RFC 9110
+            unchanged = False
+            if "If-None-Match" in self.headers:
+                unchanged = etag in [tag.strip() for tag in self.headers["If-None-Match"].split(",")]
+            elif "If-Modified-Since" in self.headers:
+                since = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+                unchanged = int(os.path.getmtime(path)) <= since.timestamp()
+
+            self.send_response(304 if unchanged else 200)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", modified)
+            if unchanged:
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_header("Content-Type", "text/csv; charset=iso-8859-1")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            for start in range(0, len(body), CHUNK_SIZE):
+                self.wfile.write(body[start:start + CHUNK_SIZE])
+
+    return Handler
+
+
+def serve(directory, port=0, latency=0.0, fail_every=0):
+    # Start in a background thread; returns the server (server_address has the port)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(directory, latency, fail_every))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve StatBank CSV exports over HTTP with conditional GET support")
+    parser.add_argument("--directory", default=os.path.join(ROOT, "Data"))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering each request")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with 503")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port),
+                                 make_handler(args.directory, args.latency, args.fail_every))
+    print(f"Serving {args.directory} on http://127.0.0.1:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import os
+
+DURATIONS = ["Total", "1 day", "2-5 days", "6-30 days", "31-119 days",
+             "120-364 days", "All year", "Not stated"]
+RESIDENTS = ["Stays", "Stays with children", "Women", "Children"]
+AGE_GROUPS = ["18-24 years", "25-29 years", "30-39 years", "40-49 years",
+              "50 years and over", "Age not stated"]
+ANCESTRIES = ["Total", "Persons of Danish origin", "Immigrants and descendants", "Unknown origin"]
+REGIONS = ["All Denmark", "Region Hovedstaden", "Region Sjælland", "Region Syddanmark",
+           "Region Midtjylland", "Region Nordjylland", "Not stated"]
+
+
+def write_table(path, title, sections, groups, years, seed=0):
+    # Writes a StatBank-style export: multi-line title, indented hierarchy,
+    # ';'-delimited quoted cells, latin-1, CRLF and a footnote block
+    value = seed
+    lines = [f'"{title}"', '"duration and time"', "",
+             ";".join(['" "'] * 3 + [f'"{y}"' for y in years])]
+    for section in sections:
+        lines.append(f'"{section}"')
+        for group in groups:
+            lines.append(f'" ";"{group}"')
+            for duration in DURATIONS:
+                cells = []
+                for _ in years:
+                    value = (value * 1103515245 + 12345) % 2147483648
+                    cells.append(str(value % 5000))
+                lines.append(f'" ";" ";"{duration}";' + ";".join(cells))
+    lines += ["", '"The statistics relate to stays at women\'s shelters. "', ""]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="latin1", newline="") as f:
+        f.write("\r\n".join(lines))
+    return path
+
+
+def write_export(path, n_sections=6, n_groups=4, n_years=7, first_year=2017, seed=0):
+    groups = (RESIDENTS * (n_groups // len(RESIDENTS) + 1))[:n_groups]
+    groups = [g if i < len(RESIDENTS) else f"{g} {i}" for i, g in enumerate(groups)]
+    sections = [f"Section {s} Sjælland" for s in range(n_sections)]
+    years = [first_year + i for i in range(n_years)]
+    title = "Stays and residents at women's shelters by synthetic group, resident status,"
+    return write_table(path, title, sections, groups, years, seed)
+
+
+def rows_for(n_rows, n_groups=4, n_years=7):
+    # Number of sections needed for roughly n_rows body lines
+    per_section = 1 + n_groups * (1 + len(DURATIONS))
+    return max(1, n_rows // per_section)
+
+
+def scale_factors(scale, max_year_factor=10):
+    # Grow the number of years first (up to 10x), then the number of categories
+    year_factor = min(scale, max_year_factor)
+    return year_factor, max(1, scale // year_factor)
+
+
+def write_dataset(directory, scale=1, last_year=2023):
+    # Age, Ancestry and Region exports shaped like the real ones, scaled up
+    # with extra years, extra age groups/ancestries and extra regions
+    year_factor, category_factor = scale_factors(scale)
+    years = list(range(last_year - 7 * year_factor + 1, last_year + 1))
+
+    def extend(labels, prefix):
+        extra = len(labels) * (category_factor - 1)
+        return labels + [f"{prefix} {i}" for i in range(extra)]
+
+    return {
+        "Age": write_table(os.path.join(directory, "Age.csv"),
+                           "Stays and residents at women's shelters by age, resident status,",
+                           extend(AGE_GROUPS, "Age group"), RESIDENTS, years, seed=1),
+        "Ancestry": write_table(os.path.join(directory, "Ancestry.csv"),
+                                "Stays and residents at women's shelters by ancestry, resident status,",
+                                extend(ANCESTRIES, "Ancestry"), RESIDENTS, years, seed=2),
+        "Region": write_table(os.path.join(directory, "Region.csv"),
+                              "Stays and residents at women's shelters by resident status, region of",
+                              RESIDENTS, extend(REGIONS, "Municipality"), years, seed=3),
+    }
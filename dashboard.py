@@ -1,38 +1,59 @@
-from dash import Dash, html, dcc
-import pandas as pd
-import plotly.express as px
+from functools import lru_cache
+import hashlib
 import json
+import os
+import warnings
+
+import flask
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction, Patch, ctx
+from dash.exceptions import PreventUpdate
+
+from Data import metrics
+import serving
+import startup
+
+# Loaded on first use, so a start from the snapshot never imports them
+np = startup.lazy_import("numpy")
+px = startup.lazy_import("plotly.express")
+go = startup.lazy_import("plotly.graph_objects")
+store = startup.lazy_import("Data.store")
+simplify = startup.lazy_import("Geomap.simplify")
+spatial = startup.lazy_import("Geomap.spatial")
+
+RESIDENT_COLORS = {
+    "Stays": "rgb(221, 204, 119)",
+    "Stays with children": "rgb(153, 153, 51)",
+    "Women": "rgb(136, 204, 238)",
+    "Children": "rgb(17, 119, 51)"
+}
+
+AGE_COLORS = {
+    "18-24 years": "rgb(136, 34, 85)",
+    "25-29 years": "rgb(51, 34, 136)",
+    "30-39 years": "rgb(17, 119, 51)",
+    "40-49 years": "rgb(136, 204, 238)",
+    "50 years and over": "rgb(153, 153, 51)",
+    "Age not stated": "rgb(221, 204, 119)"
+}
 
 # Custom Pie Chart Function
-def create_pie_chart():
-    data = {
-        "Age ": ["18-24 years", "25-29 years", "30-39 years", "40-49 years", "50 years and over", "Age not stated"],
-        "Women ": [401, 478, 1051, 626, 336, 138]
-    }
-    df = pd.DataFrame(data)
-    total = df["Women "].sum()
-    df["Percentage "] = df["Women "].apply(lambda x: f"{(x / total * 100):.2f}%")
+@metrics.timed("figure.create_pie_chart", size=metrics.json_size)
+def create_pie_chart(df, year, resident="Women"):
+    df = df.rename(columns={"Category": "Age ", "Value": "Women "})
+    df["Percentage "] = np.char.mod("%.2f%%", df["Share"].to_numpy(dtype=float) * 100)
     df["Legend_Label"] = df["Age "]
-    custom_colors = {
-        "18-24 years": "rgb(136, 34, 85)",
-        "25-29 years": "rgb(51, 34, 136)",
-        "30-39 years": "rgb(17, 119, 51)",
-        "40-49 years": "rgb(136, 204, 238)",
-        "50 years and over": "rgb(153, 153, 51)",
-        "Age not stated": "rgb(221, 204, 119)"
-    }
     fig = px.pie(
-        df, names="Legend_Label", values="Women ", title="Age Distribution of Women",
-        color="Legend_Label", color_discrete_map=custom_colors, hole=0.5
+        df, names="Legend_Label", values="Women ", title=f"Age Distribution of {resident}",
+        color="Legend_Label", color_discrete_map=AGE_COLORS, hole=0.5
     )
     fig.update_traces(
         textinfo="none",
-        hovertemplate="<b>Age Group:</b> %{label}<br><b>Women:</b> %{value}<br><b>Percentage:</b> %{percent}<extra></extra>"
+        hovertemplate=f"<b>Age Group:</b> %{{label}}<br><b>{resident}:</b> %{{value}}<br><b>Percentage:</b> %{{percent}}<extra></extra>"
     )
     fig.update_layout(
-        title=dict(text="Age Distribution of Women", x=0.5, font=dict(size=20)),
+        title=dict(text=f"Age Distribution of {resident}", x=0.5, font=dict(size=20)),
         annotations=[dict(
-            text="Year: 2023", x=0.5, y=0.5, font=dict(size=14, color="gray"),
+            text=f"Year: {year}", x=0.5, y=0.5, font=dict(size=14, color="gray"),
             showarrow=False, align="center"
         )],
         legend_title=dict(text="Age Group"),
@@ -41,16 +62,9 @@ def create_pie_chart():
     return fig
 
 # Custom Bar Chart Function
-def create_bar_chart():
-    data = {
-        'TID': [2023] * 12,
-        'KMDR': ['1 day', '1 day', '2-5 days', '2-5 days', '6-30 days', '6-30 days',
-                 '31-119 days', '31-119 days', '120-364 days', '120-364 days', 'All year', 'All year'],
-        'BEBOSTAT': ['Women', 'Children', 'Women', 'Children', 'Women', 'Children',
-                     'Women', 'Children', 'Women', 'Children', 'Women', 'Children'],
-        'INDHOLD': [140, 80, 248, 212, 731, 612, 1093, 1000, 755, 614, 63, 56]
-    }
-    df = pd.DataFrame(data)
+@metrics.timed("figure.create_bar_chart", size=metrics.json_size)
+def create_bar_chart(df, year):
+    df = df.rename(columns={'Duration': 'KMDR', 'Resident': 'BEBOSTAT', 'Value': 'INDHOLD'})
     fig = px.bar(
         df, x='KMDR', y='INDHOLD', color='BEBOSTAT', barmode='group',
         title="Duration of Stays at Women's Shelters",
@@ -70,10 +84,10 @@ def create_bar_chart():
     )
 
     fig.for_each_trace(
-        lambda trace: trace.update(marker_color='rgb(136, 204, 238)' if trace.name == 'Women' else 'rgb(17, 119, 51)')
+        lambda trace: trace.update(marker_color=RESIDENT_COLORS[trace.name])
     )
     fig.add_annotation(
-        x=0.5, y=1.15, xref="paper", yref="paper", text="Year: 2023",
+        x=0.5, y=1.15, xref="paper", yref="paper", text=f"Year: {year}",
         showarrow=False, font=dict(size=14, color="gray"), align="center"
     )
     fig.update_layout(
@@ -83,20 +97,9 @@ def create_bar_chart():
     return fig
 
 # Custom Line Chart Function
-def create_plot_line_chart():
-    data = {
-        "BEBOSTAT": ["Stays", "Stays", "Stays", "Stays", "Stays", "Stays", "Stays",
-                     "Women", "Women", "Women", "Women", "Women", "Women", "Women",
-                     "Children", "Children", "Children", "Children", "Children", "Children", "Children"],
-        "TID": [2017, 2018, 2019, 2020, 2021, 2022, 2023,
-                2017, 2018, 2019, 2020, 2021, 2022, 2023,
-                2017, 2018, 2019, 2020, 2021, 2022, 2023],
-        "INDHOLD": [1971, 2421, 2627, 2744, 3117, 3606, 3776,
-                    1691, 2046, 2194, 2346, 2619, 2949, 3030,
-                    1728, 1931, 1960, 2165, 2273, 2370, 2574]
-    }
-
-    df = pd.DataFrame(data)
+@metrics.timed("figure.create_plot_line_chart", size=metrics.json_size)
+def create_plot_line_chart(df):
+    df = df.rename(columns={"Resident": "BEBOSTAT", "Year": "TID", "Value": "INDHOLD"})
 
     fig = px.line(
         df,
@@ -110,11 +113,7 @@ def create_plot_line_chart():
             "BEBOSTAT": "Resident Status"
         },
         markers=True,
-        color_discrete_map={
-            "Stays": "rgb(221, 204, 119)",
-            "Women": "rgb(136, 204, 238)",
-            "Children": "rgb(17, 119, 51)"
-        }
+        color_discrete_map=RESIDENT_COLORS
     )
 
     fig.for_each_trace(lambda trace: trace.update(
@@ -144,6 +143,8 @@ def create_plot_line_chart():
         margin=dict(l=40, r=40, t=80, b=40)
     )
 
+    # Labels sit on opposite sides of their lines so they stay apart however
+    # far the axis extends (the forecast adds years past the data)
     fig.add_vline(
         x=2020.25,
         line=dict(color="rgb(136, 34, 85)", width=2, dash="dash"),
@@ -154,43 +155,49 @@ def create_plot_line_chart():
         x=2021.50,
         line=dict(color="rgb(136, 34, 85)", width=2, dash="dash"),
         annotation_text="Reopening Phase 3 (Jun.21)",
-        annotation_position="top left"
+        annotation_position="top right"
     )
     return fig
 
-# Geomap Function
-def create_geomap():
-    with open("filtered_denmark_regions.geojson", "r") as file:
-        filtered_geojson = json.load(file)
-
-    region_mapping = {
-        "Region Hovedstaden": "Capital Region of Denmark",
-        "Region Sjælland": "Region Zealand",
-        "Region Syddanmark": "Region of Southern Denmark",
-        "Region Midtjylland": "Central Denmark Region",
-        "Region Nordjylland": "North Denmark Region"
-    }
+# Play/pause buttons and frame slider matching Plotly Express animations
+def animation_buttons():
+    return dict(
+        type="buttons", direction="left", showactive=False,
+        x=0.1, xanchor="right", y=0, yanchor="top", pad={"r": 10, "t": 70},
+        buttons=[
+            dict(label="&#9654;", method="animate", args=[None, {
+                "frame": {"duration": 500, "redraw": True}, "mode": "immediate",
+                "fromcurrent": True, "transition": {"duration": 500, "easing": "linear"}}]),
+            dict(label="&#9724;", method="animate", args=[[None], {
+                "frame": {"duration": 0, "redraw": True}, "mode": "immediate",
+                "fromcurrent": True, "transition": {"duration": 0, "easing": "linear"}}]),
+        ],
+    )
 
-    shelter_data = {
-        "Region": ["Region Hovedstaden", "Region Sjælland", "Region Syddanmark", "Region Midtjylland", "Region Nordjylland"] * 7,
-        "Year": [2017, 2017, 2017, 2017, 2017,
-                 2018, 2018, 2018, 2018, 2018,
-                 2019, 2019, 2019, 2019, 2019,
-                 2020, 2020, 2020, 2020, 2020,
-                 2021, 2021, 2021, 2021, 2021,
-                 2022, 2022, 2022, 2022, 2022,
-                 2023, 2023, 2023, 2023, 2023],
-        "Stays": [683, 264, 312, 384, 147,
-                  906, 330, 406, 449, 182,
-                  1032, 430, 405, 434, 187,
-                  1100, 445, 447, 443, 179,
-                  1170, 525, 556, 531, 209,
-                  1311, 548, 649, 695, 218,
-                  1394, 582, 715, 706, 220]
-    }
 
-    shelter_df = pd.DataFrame(shelter_data)
-    shelter_df["MappedRegion"] = shelter_df["Region"].map(region_mapping)
+def animation_slider(frame_names, prefix):
+    step_args = {"frame": {"duration": 0, "redraw": True}, "mode": "immediate",
+                 "fromcurrent": True, "transition": {"duration": 0, "easing": "linear"}}
+    return dict(
+        active=0, currentvalue={"prefix": prefix}, len=0.9, pad={"b": 10, "t": 60},
+        x=0.1, xanchor="left", y=0, yanchor="top",
+        steps=[dict(label=str(name), method="animate", args=[[str(name)], step_args])
+               for name in frame_names],
+    )
+
+# Geomap Function
+@metrics.timed("figure.create_geomap", size=metrics.json_size)
+def create_geomap(shelter_df, geojson=None, resident="Stays"):
+    # Simplified geometry is built once, cached on disk and shared between builds
+    filtered_geojson = simplify.load_geometry() if geojson is None else geojson
+
+    # Region names are matched to the map features through the cached join
+    # index, which also accepts upper case and mis-decoded Danish letters
+    shelter_df = shelter_df.rename(columns={"Value": "Stays"})
+    shelter_df["MappedRegion"] = spatial.match_regions(shelter_df["Region"])
+    unmatched = shelter_df.loc[shelter_df["MappedRegion"].isna(), "Region"].unique()
+    if len(unmatched):
+        warnings.warn(f"No map region for {', '.join(map(str, unmatched))}", stacklevel=2)
 
     safe3_hues = [
         "rgb(229, 245, 224)",
@@ -201,43 +208,53 @@ def create_geomap():
 
     max_value = shelter_df["Stays"].max()
 
-    fig = px.choropleth_mapbox(
-        shelter_df,
-        geojson=filtered_geojson,
-        locations="MappedRegion",
-        featureidkey="properties.name",
-        color="Stays",
-        color_continuous_scale=safe3_hues,
-        animation_frame="Year",
-        mapbox_style="carto-positron",
-        center={"lat": 56, "lon": 10},
-        zoom=5,
-        range_color=(0, max_value)
+    # One groupby gives a Year x Region matrix; each frame is one row of it
+    stays = shelter_df.groupby(["Year", "MappedRegion"], observed=True)["Stays"].sum().unstack()
+    regions = stays.columns.astype(str).to_numpy()
+    years = stays.index.to_numpy()
+
+    hovertemplate = (
+        "<b>Region:</b> %{location}<br>"
+        "<b>Year:</b> %{customdata}<br>"
+        f"<b>{resident}:</b> %{{z}}<extra></extra>"
     )
 
-    for frame in fig.frames:
-        for trace in frame.data:
-            trace.update(
-                customdata=shelter_df[shelter_df['Year'] == int(frame.name)][["MappedRegion", "Year", "Stays"]].to_numpy(),
-                hovertemplate=(
-                    "<b>Region:</b> %{customdata[0]}<br>"
-                    "<b>Year:</b> %{customdata[1]}<br>"
-                    "<b>Stays:</b> %{customdata[2]}<extra></extra>"
-                )
-            )
+    # Geometry, locations and styling live on the base trace only
+    fig = go.Figure(
+        go.Choroplethmapbox(
+            geojson=filtered_geojson,
+            locations=regions,
+            featureidkey="properties.name",
+            z=stays.iloc[0].to_numpy(),
+            customdata=np.full(len(regions), years[0]),
+            coloraxis="coloraxis",
+            hovertemplate=hovertemplate,
+        )
+    )
 
-    fig.update_traces(
-        customdata=shelter_df[["MappedRegion", "Year", "Stays"]].to_numpy(),
-        hovertemplate=(
-            "<b>Region:</b> %{customdata[0]}<br>"
-            "<b>Year:</b> %{customdata[1]}<br>"
-            "<b>Stays:</b> %{customdata[2]}<extra></extra>"
+    # Frames only carry the value vector and the year for the hover label
+    fig.frames = [
+        go.Frame(
+            name=str(frame_year),
+            data=[go.Choroplethmapbox(z=row, customdata=np.full(len(regions), frame_year))],
+            traces=[0],
         )
+        for frame_year, row in zip(years, stays.to_numpy())
+    ]
+
+    fig.update_layout(
+        mapbox=dict(style="carto-positron", center={"lat": 56, "lon": 10}, zoom=5),
+        coloraxis=dict(
+            colorscale=safe3_hues, cmin=0, cmax=max_value,
+            colorbar=dict(title=dict(text=resident))
+        ),
+        updatemenus=[animation_buttons()],
+        sliders=[animation_slider(years, "Year=")],
     )
 
     fig.update_layout(
         title={
-            "text": "Stays by Region of Residence and Time",
+            "text": f"{resident} by Region of Residence and Time",
             "x": 0.5,
             "y": 0.95,
             "font": {"size": 20}
@@ -247,73 +264,495 @@ def create_geomap():
 
     return fig
 
+ALL_REGIONS = "All Denmark"
+ALL_AGES = "All ages"
+
+class FigureTemplate:
+    # Styled skeleton of a chart, built once through Plotly Express; new
+    # figures copy it and swap in the data arrays, skipping validation
+
+    def __init__(self, fig):
+        skeleton = fig.to_dict()
+        self.layout = skeleton["layout"]
+        self.traces = {trace.get("name", ""): trace for trace in skeleton["data"]}
+
+    def trace(self, name, **data):
+        return {**self.traces[name], **data}
+
+    def figure(self, traces, **layout):
+        return {"data": traces, "layout": {**self.layout, **layout}}
+
+
+def counts(values):
+    # Plain integers for JSON; suppressed cells become NaN gaps
+    return values.to_numpy(dtype=float, na_value=np.nan) if values.hasnans else values.to_numpy()
+
+
+def labels_column(name, n):
+    # customdata holding the trace name, as the factories' hovertemplates expect
+    return np.full((n, 1), name, dtype=object)
+
+
+def year_annotation(template, selected_year):
+    return [{**template.layout["annotations"][0], "text": f"Year: {selected_year}"}]
+
+
+# One template per chart type (per resident for the pie, whose labels name it)
+@lru_cache(maxsize=None)
+def line_template():
+    return FigureTemplate(create_plot_line_chart(store.resident_trend(tuple(RESIDENT_COLORS))))
+
+
+@lru_cache(maxsize=None)
+def pie_template(resident):
+    year = store.latest_year()
+    return FigureTemplate(create_pie_chart(store.age_distribution(year, resident), year, resident))
+
+
+@lru_cache(maxsize=None)
+def bar_template():
+    year = store.latest_year()
+    return FigureTemplate(create_bar_chart(store.duration_distribution(year, tuple(RESIDENT_COLORS)), year))
+
+
+FORECAST_HOVER = (
+    "<b>Resident Status:</b> %{customdata[0]}<br>"
+    "<b>Year:</b> %{x}<br>"
+    "<b>Projected:</b> %{y:,.0f} (%{customdata[1]:,.0f} to %{customdata[2]:,.0f})<extra></extra>"
+)
+
+
+def translucent(color, alpha=0.15):
+    return color.replace("rgb(", "rgba(").replace(")", f", {alpha})")
+
+
+def forecast_traces(template, df):
+    # Dashed projection of each series inside its prediction band, in the
+    # series' legend group so toggling a resident hides its forecast too
+    traces = []
+    for resident, part in df.groupby("Resident", sort=False):
+        color = template.traces[resident]["line"]["color"]
+        common = {"type": "scatter", "mode": "lines", "x": part["Year"].to_numpy(),
+                  "legendgroup": resident, "showlegend": False}
+        traces += [
+            {**common, "y": part["Upper"].to_numpy(), "line": {"width": 0}, "hoverinfo": "skip"},
+            {**common, "y": part["Lower"].to_numpy(), "line": {"width": 0}, "hoverinfo": "skip",
+             "fill": "tonexty", "fillcolor": translucent(color)},
+            {**common, "y": part["Value"].to_numpy(), "name": f"{resident} (projected)",
+             "line": {"color": color, "dash": "dash"}, "hovertemplate": FORECAST_HOVER,
+             "customdata": np.column_stack([labels_column(resident, len(part)), part[["Lower", "Upper"]]])},
+        ]
+    return traces
+
+
+@metrics.timed("figure.line_template", size=metrics.json_size)
+def line_figure(df, forecast=None):
+    template = line_template()
+    traces = [
+        template.trace(resident, x=part["Year"].to_numpy(), y=counts(part["Value"]),
+                       customdata=labels_column(resident, len(part)))
+        for resident, part in df.groupby("Resident", sort=False)
+    ]
+    if forecast is not None:
+        traces += forecast_traces(template, forecast)
+    return template.figure(traces)
+
+
+@metrics.timed("figure.pie_template", size=metrics.json_size)
+def pie_figure(df, selected_year, resident="Women"):
+    template = pie_template(resident)
+    labels = df["Category"].astype(str).to_numpy(dtype=object)
+    trace = template.trace("", labels=labels, values=counts(df["Value"]), customdata=labels[:, None],
+                           marker={"colors": [AGE_COLORS.get(label) for label in labels]})
+    return template.figure([trace], annotations=year_annotation(template, selected_year))
+
+
+@metrics.timed("figure.bar_template", size=metrics.json_size)
+def bar_figure(df, selected_year):
+    template = bar_template()
+    traces = [
+        template.trace(resident, x=part["Duration"].astype(str).to_numpy(dtype=object),
+                       y=counts(part["Value"]), customdata=labels_column(resident, len(part)))
+        for resident, part in df.groupby("Resident", sort=False)
+    ]
+    return template.figure(traces, annotations=year_annotation(template, selected_year))
+
+
+# Upper bound on memoized figures per chart; least recently used are evicted
+FIGURE_CACHE_SIZE = 128
+
+
+def breakdown(region, age_group):
+    # The exports have no region x age table, so an age group takes precedence
+    if age_group and age_group != ALL_AGES:
+        return ("Age", age_group)
+    return ("Region", region or ALL_REGIONS)
+
+
+# Figures come from the templates and are memoized by filter state, so a new
+# selection only slices the cube and a repeated one skips even that
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def render_line_chart(residents, region, age_group):
+    by = breakdown(region, age_group)
+    return line_figure(store.resident_trend(residents, by), store.resident_forecast(residents, by))
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def render_pie_chart(selected_year, resident):
+    df = store.age_distribution(selected_year, resident)
+    return pie_figure(df, selected_year, resident)
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def render_bar_chart(selected_year, residents, region, age_group):
+    df = store.duration_distribution(selected_year, residents, breakdown(region, age_group))
+    return bar_figure(df, selected_year)
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def render_geomap(resident):
+    # The geometry is referenced by URL, so browsers download it once and cache it
+    return create_geomap(store.region_trend(resident), geojson=geometry_url(), resident=resident).to_dict()
+
+
+@lru_cache(maxsize=None)
+def geometry_asset():
+    # Simplified region GeoJSON and a file name carrying its content hash
+    data = json.dumps(simplify.load_geometry(), separators=(",", ":")).encode("utf-8")
+    return f"regions.{hashlib.sha256(data).hexdigest()[:12]}.json", data
+
+
+def geometry_url():
+    return app.get_relative_path(f"/geometry/{geometry_asset()[0]}")
+
+
+# Trace fields the figure functions fill with data; templates ship without them
+DATA_FIELDS = ("x", "y", "z", "labels", "values", "customdata", "locations")
+
+
+def skeleton(layout, traces):
+    return {"layout": layout,
+            "traces": {trace.get("name", ""): {k: v for k, v in trace.items() if k not in DATA_FIELDS}
+                       for trace in traces}}
+
+
+@lru_cache(maxsize=None)
+def client_data_asset():
+    # The cube plus the figure templates, everything the browser needs to draw
+    # any filter state itself; a fresh snapshot carries a prebuilt copy
+    if snapshot and "client_data" in snapshot:
+        return snapshot["client_data"].encode("utf-8")
+    from plotly.io.json import to_json_plotly
+
+    geomap = render_geomap(next(iter(RESIDENT_COLORS)))
+    data = {
+        "cube": store.columnar(),
+        "residents": list(RESIDENT_COLORS),
+        "age_colors": AGE_COLORS,
+        "durations": store.DURATIONS,
+        "national": store.NATIONAL,
+        "all_regions": ALL_REGIONS,
+        "all_ages": ALL_AGES,
+        "map_regions": dict(zip(store.REGIONS, spatial.match_regions(store.REGIONS).tolist())),
+        "forecasts": store.forecasts(),
+        "forecast_hover": FORECAST_HOVER,
+        "kpi_trends": {r: {year: kpi_trend(r, year) for year in store.years()} for r in ("Women", "Children")},
+        "templates": {
+            "line": skeleton(line_template().layout, line_template().traces.values()),
+            "bar": skeleton(bar_template().layout, bar_template().traces.values()),
+            "pie": {r: skeleton(pie_template(r).layout, pie_template(r).traces.values()) for r in RESIDENT_COLORS},
+            "geomap": skeleton(geomap["layout"], geomap["data"]),
+        },
+    }
+    return to_json_plotly(data).encode("utf-8")
+
+
+def client_data_url():
+    # DATA_VERSION hashes the exports and the code, so the URL can be cached forever
+    return app.get_relative_path(f"/data/cube.{DATA_VERSION}.json")
+
+
+# After the first render the browser already holds each figure's layout
+# (and the map's geometry), so filter changes only send what they replace.
+# Every patch assigns whole values, so it is correct whatever came before.
+def figure_patch(figure, *layout_keys):
+    patch = Patch()
+    patch["data"] = figure["data"]
+    for key in layout_keys:
+        patch["layout"][key] = figure["layout"][key]
+    return patch
+
+
+def geomap_patch(figure):
+    patch = Patch()
+    for key in ("locations", "z", "customdata", "hovertemplate"):
+        patch["data"][0][key] = figure["data"][0][key]
+    patch["frames"] = figure["frames"]
+    patch["layout"]["coloraxis"] = figure["layout"]["coloraxis"]
+    patch["layout"]["title"] = figure["layout"]["title"]
+    return patch
+
+
+def kpi_trend(resident, selected_year):
+    # Change on the year before and compound growth since the first year
+    summary = store.kpi_trend(resident, selected_year)
+    if summary is None:
+        return ""
+    parts = []
+    if summary["previous"] is not None and not np.isnan(summary["yoy_pct"]):
+        parts.append(f"{summary['yoy_pct']:+.1%} on {summary['previous']}")
+    if not np.isnan(summary["cagr"]):
+        parts.append(f"{summary['cagr']:+.1%} a year since {summary['since']}")
+    return ", ".join(parts)
+
+
+def resident_options(residents):
+    return [{"label": r, "value": r} for r in residents]
+
+
+def ordered(residents):
+    # Canonical, hashable form of a checklist value for the figure caches
+    return tuple(r for r in RESIDENT_COLORS if r in (residents or []))
+
+
+def kpi_card(kpi_id, text):
+    return html.Div(
+        style={"background-color": "#e0e0e0", "padding": "30px", "border-radius": "8px", "width": "300px"},
+        children=[
+            html.H2(id=f"{kpi_id}-kpi", style={"color": "rgb(17, 119, 51)", "font-size": "36px"}),
+            html.P(text, style={"font-size": "16px"}),
+            html.P(id=f"{kpi_id}-kpi-year", style={"font-size": "14px", "color": "#555"}),
+            html.P(id=f"{kpi_id}-kpi-trend", style={"font-size": "14px", "color": "#555"}),
+        ],
+    )
+
+
+filter_style = {"width": "220px"}
+
 # Initialize the Dash app
 app = Dash(__name__)
 
-# Layout
-app.layout = html.Div(
-    style={
-        "font-family": "Arial, sans-serif",
-        "padding": "20px",
-        "background-color": "#f9f9f9",
-    },
-    children=[
-        html.H1("Interactive Visualisation of Women's Shelters in Denmark", style={"text-align": "center", "margin-bottom": "40px", "color": "#1a3c40"}),
-        html.H3("Hacher Al-Badri & Cindy Lu", style={"text-align": "center", "margin-bottom": "5px", "color": "#1a3c40"}),
-        html.H5("Data Science (DS808), University of Southern Denmark", style={"text-align": "center", "margin-bottom": "40px", "color": "#1a3c40"}),
-
-        # Metrics Row
-        html.Div(
-            style={"display": "flex", "justify-content": "center", "gap": "30px", "margin-bottom": "40px"},
-            children=[
-                html.Div(
-                    style={"background-color": "#e0e0e0", "padding": "30px", "border-radius": "8px", "width": "300px"},
-                    children=[
-                        html.H2("3,030", style={"color": "rgb(17, 119, 51)", "font-size": "36px"}),
-                        html.P("Number of women staying at women's shelters", style={"font-size": "16px"}),
-                        html.P("2023", style={"font-size": "14px", "color": "#555"}),
-                    ],
-                ),
-                html.Div(
-                    style={"background-color": "#e0e0e0", "padding": "30px", "border-radius": "8px", "width": "300px"},
-                    children=[
-                        html.H2("2,574", style={"color": "rgb(17, 119, 51)", "font-size": "36px"}),
-                        html.P("Number of children staying at women's shelters", style={"font-size": "16px"}),
-                        html.P("2023", style={"font-size": "14px", "color": "#555"}),
-                    ],
-                ),
-            ],
-        ),
+# Registered first so its after_request hook runs last and sees compressed sizes
+metrics.install(app.server)
 
-        # Line Chart Row
-        html.Div(
-            style={"margin-bottom": "40px"},
-            children=[dcc.Graph(id="line-chart", figure=create_plot_line_chart())],
-        ),
+# Version of the data and code behind every response and client-side asset
+DATA_VERSION = startup.snapshot_key()
 
-        # Charts Row 2: Pie Chart and Bar Chart
-        html.Div(
-            style={"display": "flex", "justify-content": "space-between", "margin-bottom": "40px"},
-            children=[
-                html.Div(
-                    style={"flex": "1", "margin-right": "20px"},
-                    children=[dcc.Graph(id="pie-chart", figure=create_pie_chart())],
-                ),
-                html.Div(
-                    style={"flex": "1", "margin-left": "20px"},
-                    children=[dcc.Graph(id="bar-chart", figure=create_bar_chart())],
-                ),
-            ],
-        ),
+# Filter changes are drawn in the browser from a preloaded copy of the cube
+# (assets/filters.js); DASHBOARD_CLIENTSIDE=off answers them on the server
+CLIENTSIDE = os.environ.get("DASHBOARD_CLIENTSIDE", "on") != "off"
 
-        # Geomap Row
-        html.Div(
-            style={"margin-bottom": "40px", "height": "700px"},  # Adjust the height here
-            children=[dcc.Graph(id="geomap", figure=create_geomap(), style={"height": "100%"})],
-        ),
-    ],
+
+# Layout: graphs start empty and are filled by callbacks, the map only once it scrolls into view
+def build_layout():
+    # Only needed without a snapshot: the filter options come from the dataset
+    year = store.latest_year()
+    return html.Div(
+        style={
+            "font-family": "Arial, sans-serif",
+            "padding": "20px",
+            "background-color": "#f9f9f9",
+        },
+        children=[
+            html.H1("Interactive Visualisation of Women's Shelters in Denmark", style={"text-align": "center", "margin-bottom": "40px", "color": "#1a3c40"}),
+            html.H3("Hacher Al-Badri & Cindy Lu", style={"text-align": "center", "margin-bottom": "5px", "color": "#1a3c40"}),
+            html.H5("Data Science (DS808), University of Southern Denmark", style={"text-align": "center", "margin-bottom": "40px", "color": "#1a3c40"}),
+
+            # Filters Row
+            html.Div(
+                style={"display": "flex", "justify-content": "center", "gap": "30px", "margin-bottom": "40px"},
+                children=[
+                    html.Div(style=filter_style, children=[
+                        html.Label("Year"),
+                        dcc.Dropdown(id="year-filter", options=store.years(), value=year, clearable=False),
+                    ]),
+                    html.Div(style=filter_style, children=[
+                        html.Label("Region of residence"),
+                        dcc.Dropdown(id="region-filter", options=[ALL_REGIONS] + store.REGIONS, value=ALL_REGIONS, clearable=False),
+                    ]),
+                    html.Div(style=filter_style, children=[
+                        html.Label("Age group"),
+                        dcc.Dropdown(id="age-filter", options=[ALL_AGES] + store.categories("Age"), value=ALL_AGES, clearable=False),
+                    ]),
+                ],
+            ),
+
+            # Metrics Row
+            html.Div(
+                style={"display": "flex", "justify-content": "center", "gap": "30px", "margin-bottom": "40px"},
+                children=[
+                    kpi_card("women", "Number of women staying at women's shelters"),
+                    kpi_card("children", "Number of children staying at women's shelters"),
+                ],
+            ),
+
+            # Line Chart Row
+            html.Div(
+                style={"margin-bottom": "40px"},
+                children=[
+                    dcc.Checklist(id="line-residents", options=resident_options(RESIDENT_COLORS), value=["Stays", "Women", "Children"], inline=True),
+                    dcc.Graph(id="line-chart"),
+                ],
+            ),
+
+            # Charts Row 2: Pie Chart and Bar Chart
+            html.Div(
+                style={"display": "flex", "justify-content": "space-between", "margin-bottom": "40px"},
+                children=[
+                    html.Div(
+                        style={"flex": "1", "margin-right": "20px"},
+                        children=[
+                            dcc.RadioItems(id="pie-resident", options=resident_options(RESIDENT_COLORS), value="Women", inline=True),
+                            dcc.Graph(id="pie-chart"),
+                        ],
+                    ),
+                    html.Div(
+                        style={"flex": "1", "margin-left": "20px"},
+                        children=[
+                            dcc.Checklist(id="bar-residents", options=resident_options(RESIDENT_COLORS), value=["Women", "Children"], inline=True),
+                            dcc.Graph(id="bar-chart"),
+                        ],
+                    ),
+                ],
+            ),
+
+            # Geomap Row
+            html.Div(
+                id="geomap-container",
+                style={"margin-bottom": "40px", "height": "700px"},  # Adjust the height here
+                children=[
+                    dcc.RadioItems(id="map-resident", options=resident_options(RESIDENT_COLORS), value="Stays", inline=True),
+                    dcc.Graph(id="geomap", style={"height": "100%"}),
+                    dcc.Store(id="geomap-visible", data=False),
+                ],
+            ),
+
+            # Where the browser loads the cube from when filtering client-side
+            dcc.Store(id="client-data", data=client_data_url()),
+        ],
+    )
+
+
+# A fresh snapshot supplies the layout and the first page's callback responses;
+# otherwise the dataset is loaded now and the page is built from it
+snapshot = startup.load_snapshot()
+app.layout = startup.components(snapshot["layout"]) if snapshot else build_layout()
+if snapshot:
+    startup.serve_snapshot(app, snapshot)
+server = app.server
+
+# Compressed responses with ETags tied to the data version; unchanged GETs get 304s
+serving.install(server, DATA_VERSION)
+
+
+@server.route(app.config.routes_pathname_prefix + "geometry/<name>")
+def geometry(name):
+    asset_name, data = geometry_asset()
+    if name != asset_name:
+        flask.abort(404)
+    response = flask.Response(data, mimetype="application/json")
+    response.headers["Cache-Control"] = serving.IMMUTABLE
+    return response
+
+
+@server.route(app.config.routes_pathname_prefix + "data/<name>")
+def client_data(name):
+    if app.get_relative_path(f"/data/{name}") != client_data_url():
+        flask.abort(404)
+    response = flask.Response(client_data_asset(), mimetype="application/json")
+    response.headers["Cache-Control"] = serving.IMMUTABLE
+    return response
+
+
+def filter_callback(*dependencies):
+    # Registers the function as a server callback, or its namesake in
+    # assets/filters.js (which also gets the client data URL) when CLIENTSIDE
+    def register(function):
+        if CLIENTSIDE:
+            app.clientside_callback(ClientsideFunction(namespace="filters", function_name=function.__name__),
+                                    *dependencies, State("client-data", "data"))
+        else:
+            app.callback(*dependencies)(function)
+        return function
+    return register
+
+
+@filter_callback(
+    Output("women-kpi", "children"),
+    Output("children-kpi", "children"),
+    Output("women-kpi-year", "children"),
+    Output("children-kpi-year", "children"),
+    Output("women-kpi-trend", "children"),
+    Output("children-kpi-trend", "children"),
+    Input("year-filter", "value"),
+)
+@metrics.timed("callback.update_kpis")
+def update_kpis(selected_year):
+    women = store.kpi("Women", selected_year)
+    children = store.kpi("Children", selected_year)
+    return (f"{women:,}", f"{children:,}", str(selected_year), str(selected_year),
+            kpi_trend("Women", selected_year), kpi_trend("Children", selected_year))
+
+
+@filter_callback(
+    Output("line-chart", "figure"),
+    Input("line-residents", "value"),
+    Input("region-filter", "value"),
+    Input("age-filter", "value"),
+)
+@metrics.timed("callback.update_line_chart")
+def update_line_chart(residents, region, age_group):
+    figure = render_line_chart(ordered(residents), region, age_group)
+    return figure if ctx.triggered_id is None else figure_patch(figure)
+
+
+@filter_callback(
+    Output("pie-chart", "figure"),
+    Input("year-filter", "value"),
+    Input("pie-resident", "value"),
+)
+@metrics.timed("callback.update_pie_chart")
+def update_pie_chart(selected_year, resident):
+    figure = render_pie_chart(selected_year, resident)
+    return figure if ctx.triggered_id is None else figure_patch(figure, "annotations", "title")
+
+
+@filter_callback(
+    Output("bar-chart", "figure"),
+    Input("year-filter", "value"),
+    Input("bar-residents", "value"),
+    Input("region-filter", "value"),
+    Input("age-filter", "value"),
+)
+@metrics.timed("callback.update_bar_chart")
+def update_bar_chart(selected_year, residents, region, age_group):
+    figure = render_bar_chart(selected_year, ordered(residents), region, age_group)
+    return figure if ctx.triggered_id is None else figure_patch(figure, "annotations")
+
+
+# The browser flips geomap-visible once the map container scrolls into view
+app.clientside_callback(
+    ClientsideFunction(namespace="lazy", function_name="observe"),
+    Output("geomap-visible", "data"),
+    Input("geomap-container", "id"),
 )
 
+
+@filter_callback(
+    Output("geomap", "figure"),
+    Input("geomap-visible", "data"),
+    Input("map-resident", "value"),
+)
+@metrics.timed("callback.update_geomap")
+def update_geomap(visible, resident):
+    if not visible:
+        raise PreventUpdate
+    # The map is first drawn when it scrolls into view; resident changes patch it
+    figure = render_geomap(resident)
+    resident_only = set(ctx.triggered_prop_ids) == {"map-resident.value"}
+    return geomap_patch(figure) if resident_only else figure
+
+
 # Run the app
 if __name__ == "__main__":
     app.run_server(debug=True)
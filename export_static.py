@@ -0,0 +1,314 @@
+# Static export of the dashboard's default view: an index.html plus the four
+# figures as JSON, every asset content-hashed and precompressed (.gz, and .br
+# when the brotli package is installed), ready for any static file server.
+#
+#   python export_static.py                 export into dist/
+#   python export_static.py --force         re-render every figure
+#
+# Figures whose input data and code are unchanged since the last export are
+# reused from the manifest instead of being rendered and compressed again.
+import argparse
+import gzip
+import hashlib
+import html
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - .br files are skipped without brotli
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(ROOT, "dist")
+MANIFEST = "export-manifest.json"
+
+# Bump whenever the exported files change shape so every figure is re-rendered
+EXPORT_VERSION = 2
+
+# Code and geometry that shape the figures; editing any of it invalidates
+# every exported figure
+CODE_FILES = [os.path.join(ROOT, "dashboard.py"), os.path.join(ROOT, "Data", "cube.py"),
+              os.path.join(ROOT, "Data", "store.py"), os.path.join(ROOT, "Data", "trends.py"),
+              os.path.join(ROOT, "Geomap", "simplify.py"), os.path.join(ROOT, "Geomap", "regioner_geo2.json")]
+
+PLOTLY_JS = "plotly.min.js"
+
+# Renders each graph once it scrolls into view, as the dashboard does
+LOADER_JS = """document.querySelectorAll("[data-figure]").forEach(function (el) {
+  var observer = new IntersectionObserver(function (entries) {
+    if (!entries[0].isIntersecting) { return; }
+    observer.disconnect();
+    fetch(el.dataset.figure).then(function (r) { return r.json(); }).then(function (figure) {
+      figure.config = {responsive: true};
+      Plotly.newPlot(el, figure);
+    });
+  }, {rootMargin: "200px"});
+  observer.observe(el);
+});
+"""
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<script src="{plotly}" defer></script>
+<script src="{loader}" defer></script>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{content_hash(data)}{ext}"
+
+
+def write_asset(output_dir, name, data):
+    # The file plus its precompressed siblings, each written atomically
+    target = os.path.join(output_dir, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    variants = [("", data), (".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    for suffix, payload in variants:
+        tmp = f"{target}{suffix}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, target + suffix)
+    return {"file": name, "bytes": len(data), "gzip": len(variants[1][1]),
+            "brotli": len(variants[2][1]) if brotli is not None else None}
+
+
+def code_digest():
+    digest = hashlib.sha256(f"export-{EXPORT_VERSION}".encode())
+    for path in CODE_FILES:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def default_view():
+    # Filter values of the page as first shown, and the figure jobs they imply
+    import dashboard
+    import startup
+    from plotly.io.json import to_json_plotly
+
+    layout = json.loads(to_json_plotly(dashboard.app.layout))
+    values = startup.layout_values(layout)
+    year = values["year-filter.value"]
+    region, age = values["region-filter.value"], values["age-filter.value"]
+    line_residents = dashboard.ordered(values["line-residents.value"])
+    bar_residents = dashboard.ordered(values["bar-residents.value"])
+    pie_resident, map_resident = values["pie-resident.value"], values["map-resident.value"]
+
+    # graph id -> (renderer name, its arguments, the store view it draws)
+    store = dashboard.store
+    jobs = {
+        "line-chart": ("render_line_chart", (line_residents, region, age),
+                       store.resident_trend(line_residents, dashboard.breakdown(region, age))),
+        "pie-chart": ("render_pie_chart", (year, pie_resident), store.age_distribution(year, pie_resident)),
+        "bar-chart": ("render_bar_chart", (year, bar_residents, region, age),
+                      store.duration_distribution(year, bar_residents, dashboard.breakdown(region, age))),
+        "geomap": ("render_geomap", (map_resident,), store.region_trend(map_resident)),
+    }
+    return layout, values, jobs
+
+
+def input_digest(code, renderer, args, view):
+    # What a figure is drawn from: the code, the filter values and the data rows
+    import pandas as pd
+
+    digest = hashlib.sha256(code.encode())
+    digest.update(json.dumps([renderer, args], default=str).encode())
+    digest.update(json.dumps(list(view.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(view, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def relative_geometry(figure):
+    # The live map loads its geometry from the site root; the export keeps it
+    # next to index.html, so dist/ can be served from any path
+    import dashboard
+
+    url = f"geometry/{dashboard.geometry_asset()[0]}"
+    data = [{**trace, "geojson": url} if isinstance(trace.get("geojson"), str) else trace
+            for trace in figure["data"]]
+    return {**figure, "data": data}
+
+
+def render_figure(graph_id, renderer, args, output_dir):
+    # Runs in a worker process: build the figure, serialize and compress it
+    from plotly.io.json import to_json_plotly
+    import dashboard
+
+    start = time.perf_counter()
+    data = to_json_plotly(relative_geometry(getattr(dashboard, renderer)(*args))).encode("utf-8")
+    asset = write_asset(output_dir, f"figures/{hashed_name(graph_id + '.json', data)}", data)
+    asset["seconds"] = time.perf_counter() - start
+    return graph_id, asset
+
+
+def copy_plotly_js(output_dir):
+    import plotly
+
+    with open(os.path.join(os.path.dirname(plotly.__file__), "package_data", PLOTLY_JS), "rb") as f:
+        data = f.read()
+    return write_asset(output_dir, f"js/{hashed_name(PLOTLY_JS, data)}", data)
+
+
+def style_attribute(style):
+    # Dash style dicts accept both css-case and camelCase keys
+    def css_name(key):
+        return "".join(f"-{c.lower()}" if c.isupper() else c for c in key)
+
+    css = "; ".join(f"{css_name(key)}: {value}" for key, value in style.items())
+    return f' style="{html.escape(css)}"'
+
+
+def render_html(node, values, figures):
+    # Static HTML for a Dash layout: controls show their selected value only
+    if node is None:
+        return ""
+    if isinstance(node, list):
+        return "".join(render_html(child, values, figures) for child in node)
+    if not isinstance(node, dict) or "props" not in node:
+        return html.escape(str(node))
+
+    kind, props = node["type"], node["props"]
+    attrs = style_attribute(props["style"]) if props.get("style") else ""
+    if props.get("id"):
+        attrs = f' id="{html.escape(str(props["id"]))}"' + attrs
+    children = values.get(f"{props.get('id')}.children", props.get("children"))
+
+    if kind == "Graph":
+        return f'<div{attrs} data-figure="{figures[props["id"]]}"></div>'
+    if kind == "Store":
+        return ""
+    if kind in ("Dropdown", "Checklist", "RadioItems"):
+        selected = props.get("value")
+        selected = ", ".join(map(str, selected)) if isinstance(selected, list) else selected
+        return f"<div{attrs}><strong>{html.escape(str(selected))}</strong></div>"
+    tag = kind.lower()
+    return f"<{tag}{attrs}>{render_html(children, values, figures)}</{tag}>"
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"figures": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def remove_unreferenced(output_dir, keep):
+    # Hashed files from earlier exports that nothing points at any more
+    for directory in ("figures", "js", "geometry"):
+        folder = os.path.join(output_dir, directory)
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            base = name[:-3] if name.endswith((".gz", ".br")) else name
+            if f"{directory}/{base}" not in keep:
+                os.remove(os.path.join(folder, name))
+
+
+def values_from_callbacks(values):
+    # Text filled in by callbacks on the live page (the KPI cards)
+    import dashboard
+
+    year = values["year-filter.value"]
+    women, children, women_year, children_year, women_trend, children_trend = dashboard.update_kpis(year)
+    return {**values, "women-kpi.children": women, "children-kpi.children": children,
+            "women-kpi-year.children": women_year, "children-kpi-year.children": children_year,
+            "women-kpi-trend.children": women_trend, "children-kpi-trend.children": children_trend}
+
+
+def export(output_dir=OUTPUT_DIR, workers=None, force=False):
+    start = time.perf_counter()
+    layout, values, jobs = default_view()
+    manifest = load_manifest(output_dir)
+    code = code_digest()
+
+    figures, results = {}, {}
+    pending = {}
+    for graph_id, (renderer, args, view) in jobs.items():
+        digest = input_digest(code, renderer, args, view)
+        previous = manifest["figures"].get(graph_id, {})
+        if not force and previous.get("input") == digest and os.path.exists(os.path.join(output_dir, previous["file"])):
+            figures[graph_id] = previous
+            results[graph_id] = "unchanged"
+        else:
+            pending[graph_id] = (renderer, args, digest)
+
+    plotly_js = manifest.get("plotly")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_figure, graph_id, renderer, args, output_dir)
+                   for graph_id, (renderer, args, _) in pending.items()]
+        if force or not plotly_js or not os.path.exists(os.path.join(output_dir, plotly_js["file"])):
+            plotly_future = pool.submit(copy_plotly_js, output_dir)
+        else:
+            plotly_future = None
+        for future in futures:
+            graph_id, asset = future.result()
+            figures[graph_id] = {**asset, "input": pending[graph_id][2]}
+            results[graph_id] = f"rendered in {asset['seconds'] * 1e3:.0f} ms"
+        if plotly_future is not None:
+            plotly_js = plotly_future.result()
+
+    # The map figure points at the geometry by a URL relative to the page
+    import dashboard
+    geometry_name, geometry_data = dashboard.geometry_asset()
+    geometry = write_asset(output_dir, f"geometry/{geometry_name}", geometry_data)
+
+    # The page is cheap to rebuild and references the current hashed files
+    loader = write_asset(output_dir, f"js/{hashed_name('loader.js', LOADER_JS.encode())}", LOADER_JS.encode())
+    body = render_html(layout, values_from_callbacks(values), {k: v["file"] for k, v in figures.items()})
+    page = PAGE.format(title="Women's Shelters in Denmark", plotly=plotly_js["file"],
+                       loader=loader["file"], body=body).encode("utf-8")
+    index = write_asset(output_dir, "index.html", page)
+
+    keep = {plotly_js["file"], loader["file"], geometry["file"]} | {f["file"] for f in figures.values()}
+    remove_unreferenced(output_dir, keep)
+    manifest = {"version": EXPORT_VERSION, "figures": figures, "plotly": plotly_js,
+                "loader": loader, "geometry": geometry, "index": index}
+    tmp = os.path.join(output_dir, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(output_dir, MANIFEST))
+    return manifest, results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the dashboard's default view as precompressed static files")
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-render figures even if their inputs are unchanged")
+    args = parser.parse_args()
+
+    manifest, results, seconds = export(args.output, args.workers, args.force)
+    for graph_id, status in results.items():
+        asset = manifest["figures"][graph_id]
+        br = f", {asset['brotli'] / 1e3:,.1f} KB br" if asset.get("brotli") else ""
+        print(f"{graph_id:<12} {status:<20} {asset['file']}  {asset['bytes'] / 1e3:,.1f} KB, "
+              f"{asset['gzip'] / 1e3:,.1f} KB gz{br}")
+    if brotli is None:
+        print("brotli is not installed; only .gz variants were written")
+    print(f"Exported to {args.output} in {seconds:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
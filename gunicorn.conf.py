@@ -0,0 +1,17 @@
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = 60
+
+# Import wsgi (dataset, geometry, default figures) once in the master before forking
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the workers do not write to (and thereby copy) the shared pages
+    gc.freeze()
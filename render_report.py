@@ -0,0 +1,264 @@
+# Batch rendering of the report figures as static PNG/SVG/PDF files: one
+# chart per region x resident status x year, drawn by the dashboard's figure
+# functions across a pool of worker processes.
+#
+#   python render_report.py                          every chart as PNG into reports/
+#   python render_report.py --formats png pdf --years 2022 2023
+#   python render_report.py --force                  re-render unchanged charts too
+#
+# Each worker keeps one Kaleido (headless Chromium) process alive for all its
+# images, so export startup is paid once per worker instead of once per image.
+# Charts whose input data and code are unchanged since the last run are skipped.
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from export_static import CODE_FILES, input_digest
+
+try:
+    from kaleido.scopes.plotly import PlotlyScope
+except ImportError:  # pragma: no cover - rendering needs kaleido, listing jobs does not
+    PlotlyScope = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(ROOT, "reports")
+MANIFEST = "render-manifest.json"
+
+# Bump whenever the rendered images change so every chart is redrawn
+RENDER_VERSION = 1
+
+FORMATS = ["png", "svg", "pdf"]
+KINDS = ["line", "pie", "bar", "map"]
+WIDTH, HEIGHT, SCALE = 1000, 600, 2
+
+# Charts per task sent to a worker; larger batches mean less inter-process traffic
+BATCH_SIZE = 8
+
+_scope = None
+
+
+def slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text).lower()).strip("-")
+
+
+def chart_jobs(kinds=KINDS, years=None, residents=None, regions=None):
+    # (file stem, kind, renderer arguments, store view it is drawn from) per chart.
+    # The age distribution has no region breakdown and the map shows every
+    # region, so those charts are per resident x year only.
+    import dashboard
+    from Data import store
+
+    years = years or store.years()
+    residents = residents or list(dashboard.RESIDENT_COLORS)
+    regions = regions or [dashboard.ALL_REGIONS] + store.REGIONS
+    all_ages = dashboard.ALL_AGES
+
+    jobs = []
+    for resident in residents:
+        for region in regions:
+            by = dashboard.breakdown(region, all_ages)
+            if "line" in kinds:
+                jobs.append((f"line/{slug(region)}-{slug(resident)}", "line", ((resident,), region, all_ages),
+                             store.resident_trend((resident,), by)))
+            for year in years if "bar" in kinds else []:
+                jobs.append((f"bar/{slug(region)}-{slug(resident)}-{year}", "bar",
+                             (year, (resident,), region, all_ages), store.duration_distribution(year, (resident,), by)))
+        for year in years:
+            if "pie" in kinds:
+                jobs.append((f"pie/{slug(resident)}-{year}", "pie", (year, resident),
+                             store.age_distribution(year, resident)))
+            if "map" in kinds:
+                jobs.append((f"map/{slug(resident)}-{year}", "map", (resident, year), store.region_trend(resident)))
+    return jobs
+
+
+def code_digest(formats, width, height, scale):
+    digest = hashlib.sha256(f"render-{RENDER_VERSION}-{width}x{height}@{scale}".encode())
+    digest.update(json.dumps(sorted(formats)).encode())
+    for path in CODE_FILES + [os.path.abspath(__file__)]:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def static_map(resident, year):
+    # Map tiles and Plotly's geo base layers are downloaded at draw time, so the
+    # report map fills the region polygons on plain axes, colored on the
+    # dashboard map's scale, with a hidden marker trace to carry the colorbar
+    import dashboard
+    from Data import store
+    from Geomap.simplify import _polygons
+    from plotly.colors import sample_colorscale
+
+    figure = dashboard.create_geomap(store.region_trend(resident), resident=resident).to_dict()
+    base = figure["data"][0]
+    frame = next(f for f in figure["frames"] if f["name"] == str(year))["data"][0]
+    coloraxis = figure["layout"]["coloraxis"]
+    features = {f["properties"]["name"]: f for f in base["geojson"]["features"]}
+
+    traces = []
+    for name, value in zip(base["locations"], frame["z"]):
+        x, y = [], []
+        for rings in _polygons(features[name]["geometry"]):
+            for ring in rings:
+                x += [p[0] for p in ring] + [None]
+                y += [p[1] for p in ring] + [None]
+        color = "lightgray"
+        if value is not None:
+            position = (value - coloraxis["cmin"]) / ((coloraxis["cmax"] - coloraxis["cmin"]) or 1)
+            color = sample_colorscale(coloraxis["colorscale"], [position])[0]
+        traces.append({"type": "scatter", "x": x, "y": y, "name": name, "mode": "lines", "fill": "toself",
+                       "fillcolor": color, "line": {"color": "white", "width": 0.5}, "showlegend": False})
+    traces.append({"type": "scatter", "x": [None], "y": [None], "mode": "markers", "showlegend": False,
+                   "marker": {"color": [coloraxis["cmin"], coloraxis["cmax"]], "coloraxis": "coloraxis"}})
+
+    title = figure["layout"]["title"]
+    layout = {
+        "title": {**title, "text": f"{title['text']} ({year})"},
+        "coloraxis": coloraxis,
+        "margin": figure["layout"]["margin"],
+        "plot_bgcolor": "white",
+        # Degrees of longitude are about 0.56 as long as degrees of latitude at 56N
+        "xaxis": {"visible": False},
+        "yaxis": {"visible": False, "scaleanchor": "x", "scaleratio": 1 / math.cos(math.radians(56))},
+    }
+    return {"data": traces, "layout": layout}
+
+
+def build_figure(kind, args):
+    import dashboard
+
+    if kind == "map":
+        return static_map(*args)
+    if kind == "line":
+        figure, region = dashboard.render_line_chart(*args), args[1]
+    elif kind == "bar":
+        figure, region = dashboard.render_bar_chart(*args), args[2]
+    else:
+        return dashboard.render_pie_chart(*args)
+    # The dashboard shows the region in its filter; a report image has to say it
+    # itself, with room above the plot for the subtitle and the year annotation
+    layout = figure["layout"]
+    title = {**layout["title"], "text": f"{layout['title']['text']}<br><sup>{region}</sup>"}
+    return {**figure, "layout": {**layout, "title": title, "margin": {**layout.get("margin", {}), "t": 160}}}
+
+
+def start_worker():
+    # One Kaleido process per worker, reused for every image it renders; plotly.js
+    # comes from the installed plotly package so nothing is fetched from a CDN
+    global _scope
+    import plotly
+
+    plotlyjs = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+    _scope = PlotlyScope(plotlyjs=plotlyjs, mathjax=False)
+
+
+def render_batch(batch, output_dir, formats, width, height, scale):
+    # Runs in a worker process: each chart is built once and exported per format
+    from plotly.io.json import to_json_plotly
+
+    results = []
+    for stem, kind, args in batch:
+        start = time.perf_counter()
+        figure = json.loads(to_json_plotly(build_figure(kind, args)))
+        files = {}
+        for fmt in formats:
+            data = _scope.transform(figure, format=fmt, width=width, height=height, scale=scale)
+            target = os.path.join(output_dir, f"{stem}.{fmt}")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+            files[fmt] = {"file": f"{stem}.{fmt}", "bytes": len(data)}
+        results.append((stem, files, time.perf_counter() - start))
+    return results
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"charts": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    os.makedirs(output_dir, exist_ok=True)
+    tmp = os.path.join(output_dir, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(output_dir, MANIFEST))
+
+
+def render(jobs, output_dir=OUTPUT_DIR, formats=("png",), workers=None, force=False,
+           width=WIDTH, height=HEIGHT, scale=SCALE):
+    if PlotlyScope is None:
+        raise RuntimeError("kaleido is required to render static images (pip install kaleido)")
+    start = time.perf_counter()
+    manifest = load_manifest(output_dir)
+    code = code_digest(formats, width, height, scale)
+
+    charts, pending, skipped = dict(manifest["charts"]), {}, 0
+    for stem, kind, args, view in jobs:
+        digest = input_digest(code, kind, args, view)
+        previous = charts.get(stem, {})
+        present = all(os.path.exists(os.path.join(output_dir, f"{stem}.{fmt}")) for fmt in formats)
+        if not force and previous.get("input") == digest and present:
+            skipped += 1
+        else:
+            pending[stem] = (kind, args, digest)
+
+    items = [(stem, kind, args) for stem, (kind, args, _) in pending.items()]
+    batches = [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+    rendered, busy = 0, 0.0
+    if batches:
+        with ProcessPoolExecutor(max_workers=workers, initializer=start_worker) as pool:
+            futures = [pool.submit(render_batch, batch, output_dir, formats, width, height, scale)
+                       for batch in batches]
+            for future in futures:
+                for stem, files, seconds in future.result():
+                    charts[stem] = {"input": pending[stem][2], "files": files}
+                    rendered += 1
+                    busy += seconds
+                # Saved as batches finish, so an interrupted run keeps its progress
+                save_manifest(output_dir, {"version": RENDER_VERSION, "charts": charts})
+
+    return {"rendered": rendered, "skipped": skipped, "render_seconds": busy,
+            "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the report charts as static images across worker processes")
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["png"])
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=KINDS)
+    parser.add_argument("--years", type=int, nargs="+", default=None, help="defaults to every year in the data")
+    parser.add_argument("--residents", nargs="+", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--height", type=int, default=HEIGHT)
+    parser.add_argument("--scale", type=float, default=SCALE)
+    parser.add_argument("--force", action="store_true", help="re-render charts even if their inputs are unchanged")
+    args = parser.parse_args()
+
+    if PlotlyScope is None:
+        print("kaleido is not installed; install it to render static images")
+        return 1
+    jobs = chart_jobs(args.kinds, args.years, args.residents)
+    result = render(jobs, args.output, args.formats, args.workers, args.force, args.width, args.height, args.scale)
+    per_chart = result["render_seconds"] / result["rendered"] * 1e3 if result["rendered"] else 0
+    print(f"{len(jobs)} charts: {result['rendered']} rendered ({per_chart:.0f} ms each in a worker), "
+          f"{result['skipped']} unchanged, {len(args.formats)} format(s), in {result['seconds']:.2f}s "
+          f"-> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# HTTP-level handling shared by every dashboard response: compression with
+# gzip (or brotli when installed) and ETag/Cache-Control validation, so
+# repeat requests for unchanged content are answered with 304s.
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+import flask
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - responses fall back to gzip
+    brotli = None
+
+COMPRESSIBLE = {"application/json", "application/javascript", "text/javascript", "text/html",
+                "text/css", "image/svg+xml"}
+MIN_COMPRESS_SIZE = 500
+
+# Static files (e.g. /assets/filters.js) are streamed from disk; compressible
+# ones up to this size are read into memory so they get the same treatment
+MAX_STATIC_SIZE = 1 << 20
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Content-hashed URLs never change meaning; everything else is revalidated
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Compressed bodies by (ETag, encoding): the same figures and bundles are
+# requested over and over, so each is compressed once
+COMPRESSED_CACHE_SIZE = 256
+_compressed = OrderedDict()
+_lock = threading.Lock()
+
+
+def pick_encoding(accept_encodings):
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding, key):
+    with _lock:
+        cached = _compressed.get((key, encoding))
+        if cached is not None:
+            _compressed.move_to_end((key, encoding))
+            return cached
+    if encoding == "br":
+        data = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    with _lock:
+        _compressed[(key, encoding)] = data
+        while len(_compressed) > COMPRESSED_CACHE_SIZE:
+            _compressed.popitem(last=False)
+    return data
+
+
+def install(server, version):
+    # ETags combine the data version with a hash of the body; they are weak
+    # so the same tag covers the identity, gzip and brotli representations
+    @server.after_request
+    def compress_and_validate(response):
+        if response.status_code != 200 or "Content-Encoding" in response.headers:
+            return response
+        static = response.direct_passthrough
+        if static:
+            length = response.content_length
+            if response.mimetype not in COMPRESSIBLE or length is None or length > MAX_STATIC_SIZE:
+                return response
+            response.direct_passthrough = False
+
+        body = response.get_data()
+        # send_file's strong ETag describes the file on disk, not the encoded body
+        if static or response.get_etag()[0] is None:
+            response.set_etag(f"{version}-{hashlib.sha256(body).hexdigest()[:16]}", weak=True)
+        if "Cache-Control" not in response.headers:
+            response.headers["Cache-Control"] = REVALIDATE
+
+        response.make_conditional(flask.request)
+        if response.status_code == 304:
+            return response
+
+        encoding = pick_encoding(flask.request.accept_encodings)
+        if encoding and response.mimetype in COMPRESSIBLE and len(body) >= MIN_COMPRESS_SIZE:
+            response.set_data(compress(body, encoding, response.get_etag()[0]))
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        return response
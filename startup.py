@@ -0,0 +1,202 @@
+# Fast cold starts: heavy modules are imported lazily, and the first page
+# view (layout, the responses to its initial server callbacks and the data
+# for client-side filtering) is replayed from a JSON snapshot written at
+# build time, so a fresh process answers without importing pandas or
+# plotly.express or loading the dataset.
+#
+#   python startup.py           rebuild the snapshot if the data or code changed
+#   python startup.py --force   rebuild it regardless
+import argparse
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+
+from Data.sources import SOURCE_FILES
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Bump whenever the snapshot layout changes shape
+SNAPSHOT_VERSION = 2
+SNAPSHOT_FILE = os.path.join(ROOT, "Data", ".cache", "snapshot.json")
+
+# Code that shapes the first page; editing any of it invalidates the snapshot
+CODE_DIRS = [ROOT, os.path.join(ROOT, "Data"), os.path.join(ROOT, "Geomap")]
+
+# Region outlines behind the map; the snapshot's figures name their hashed URL
+GEOMETRY_FILE = os.path.join(ROOT, "Geomap", "regioner_geo2.json")
+
+# Component namespaces that appear in the layout
+NAMESPACES = {"dash_html_components": "dash.html", "dash_core_components": "dash.dcc"}
+
+# First interactions worth answering from the snapshot besides the initial
+# callbacks: the map is only drawn once it scrolls into view
+FIRST_INTERACTIONS = [
+    ("geomap.figure", {"geomap-visible.data": True}, ["geomap-visible.data"]),
+]
+
+
+def lazy_import(name):
+    # Module object whose code only runs on first attribute access
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def snapshot_key():
+    # Hash of the StatBank exports and the map geometry plus the code that
+    # turns them into the page
+    digest = hashlib.sha256(f"snapshot-{SNAPSHOT_VERSION}".encode())
+    paths = sorted(SOURCE_FILES.values()) + [GEOMETRY_FILE]
+    for directory in CODE_DIRS:
+        paths += sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".py"))
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(os.path.relpath(path, ROOT).encode())
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def snapshot_path():
+    # DASHBOARD_SNAPSHOT=off starts without the snapshot, as if it were stale
+    return os.environ.get("DASHBOARD_SNAPSHOT", SNAPSHOT_FILE)
+
+
+def load_snapshot(path=None):
+    # The snapshot, or None when it is missing or describes other data
+    path = snapshot_path() if path is None else path
+    if path == "off" or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    return snapshot if snapshot.get("key") == snapshot_key() else None
+
+
+def components(node):
+    # Rebuild Dash components from their JSON form
+    if isinstance(node, list):
+        return [components(child) for child in node]
+    if isinstance(node, dict) and {"type", "namespace", "props"} <= node.keys():
+        module = importlib.import_module(NAMESPACES[node["namespace"]])
+        return getattr(module, node["type"])(**{k: components(v) for k, v in node["props"].items()})
+    return node
+
+
+def request_key(body):
+    # Canonical form of a callback request: output, input values and what changed
+    inputs = [[i["id"], i["property"], i.get("value")] for i in body.get("inputs", [])]
+    state = [[s["id"], s["property"], s.get("value")] for s in body.get("state", [])]
+    changed = sorted(body.get("changedPropIds", []))
+    return json.dumps([body.get("output"), inputs, state, changed], sort_keys=True, ensure_ascii=False)
+
+
+def serve_snapshot(app, snapshot):
+    # Answer callback requests recorded in the snapshot before Dash sees them
+    import flask
+
+    responses = snapshot["responses"]
+    path = app.config.routes_pathname_prefix + "_dash-update-component"
+
+    @app.server.before_request
+    def replay_snapshot():
+        if flask.request.path != path or flask.request.method != "POST":
+            return None
+        body = responses.get(request_key(flask.request.get_json(silent=True) or {}))
+        if body is None:
+            return None
+        return flask.Response(body, mimetype="application/json")
+
+
+def layout_values(node, values=None):
+    # {"component-id.prop": value} for every prop of every component with an id
+    values = {} if values is None else values
+    if isinstance(node, list):
+        for child in node:
+            layout_values(child, values)
+    elif isinstance(node, dict) and "props" in node:
+        props = node["props"]
+        for prop, value in props.items():
+            if "id" in props:
+                values[f"{props['id']}.{prop}"] = value
+            layout_values(value, values)
+    return values
+
+
+def callback_request(callback, values, overrides=None, changed=None):
+    overrides = overrides or {}
+    inputs = []
+    for spec in callback["inputs"]:
+        name = f"{spec['id']}.{spec['property']}"
+        inputs.append({"id": spec["id"], "property": spec["property"],
+                       "value": overrides.get(name, values.get(name))})
+    output = callback["output"]
+    if output.startswith(".."):
+        outputs = [dict(zip(("id", "property"), o.split("."))) for o in output.strip(".").split("...")]
+    else:
+        outputs = dict(zip(("id", "property"), output.split(".")))
+    return {"output": output, "outputs": outputs, "inputs": inputs, "state": [], "changedPropIds": changed or []}
+
+
+def build_snapshot(path=SNAPSHOT_FILE):
+    # Render the first page through the full app and record the responses
+    from plotly.io.json import to_json_plotly
+
+    os.environ["DASHBOARD_SNAPSHOT"] = "off"
+    import dashboard
+
+    layout = json.loads(to_json_plotly(dashboard.app.layout))
+    values = layout_values(layout)
+    client = dashboard.app.server.test_client()
+    server_callbacks = [c for c in dashboard.app._callback_list if not c.get("clientside_function")]
+    requests = [callback_request(c, values) for c in server_callbacks]
+    by_output = {c["output"]: c for c in server_callbacks}
+    requests += [callback_request(by_output[output], values, overrides, changed)
+                 for output, overrides, changed in FIRST_INTERACTIONS if output in by_output]
+
+    responses = {}
+    for body in requests:
+        response = client.post(dashboard.app.config.routes_pathname_prefix + "_dash-update-component", json=body)
+        # Callbacks that raise PreventUpdate answer 204 and are left to the app
+        if response.status_code == 200:
+            responses[request_key(body)] = response.get_data(as_text=True)
+
+    # The cube and templates the browser loads to filter client-side
+    client_data = dashboard.client_data_asset().decode("utf-8")
+
+    snapshot = {"key": snapshot_key(), "version": SNAPSHOT_VERSION, "layout": layout, "responses": responses,
+                "client_data": client_data}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the first-page snapshot used for fast cold starts")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the data and code are unchanged")
+    parser.add_argument("--output", default=SNAPSHOT_FILE)
+    args = parser.parse_args()
+
+    if not args.force and load_snapshot(args.output) is not None:
+        print(f"Snapshot is up to date: {args.output}")
+        return 0
+    start = time.perf_counter()
+    snapshot = build_snapshot(args.output)
+    print(f"Snapshot {snapshot['key']} with {len(snapshot['responses'])} responses written to {args.output} "
+          f"in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# Production entry point: gunicorn wsgi:server -c gunicorn.conf.py
+#
+# Everything expensive happens at import time, so with preload_app the
+# dataset, the simplified geometry and the default figures are built once in
+# the master process and shared copy-on-write by every forked worker.
+import argparse
+import os
+import runpy
+
+from Data import store
+from Geomap.simplify import load_geometry
+import dashboard
+
+store.get_cube()
+load_geometry()
+
+
+def warm_figures():
+    # Default view of every chart, so the first request per worker is a cache hit
+    year = store.latest_year()
+    all_regions, all_ages = dashboard.ALL_REGIONS, dashboard.ALL_AGES
+    dashboard.render_line_chart(("Stays", "Women", "Children"), all_regions, all_ages)
+    dashboard.render_pie_chart(year, "Women")
+    dashboard.render_bar_chart(year, ("Women", "Children"), all_regions, all_ages)
+    dashboard.render_geomap("Stays")
+    dashboard.client_data_asset()
+
+
+warm_figures()
+
+app = dashboard.app
+server = app.server
+
+
+def main():
+    from gunicorn.app.base import BaseApplication
+
+    parser = argparse.ArgumentParser(description="Serve the dashboard with pre-forked gunicorn workers")
+    parser.add_argument("--bind", default=os.environ.get("BIND", "0.0.0.0:8050"))
+    parser.add_argument("--workers", type=int, default=None, help="defaults to WEB_CONCURRENCY or 2 x CPUs + 1")
+    args = parser.parse_args()
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            config = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py"))
+            for key, value in config.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+            self.cfg.set("bind", [args.bind])
+            if args.workers:
+                self.cfg.set("workers", args.workers)
+
+        def load(self):
+            return server
+
+    DashboardApplication().run()
+
+
+if __name__ == "__main__":
+    main()